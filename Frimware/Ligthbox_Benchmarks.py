@@ -0,0 +1,300 @@
+# benchmarks.py - Firmware Performance Benchmarks
+import os
+import sys
+import tempfile
+import time
+import wave
+import numpy as np
+import adafruit_pixelbuf
+from led_controller import LEDMatrix
+from led_outputs import NeoPixelOutput, NullOutput, OutputBackend
+from hardware_controls import ControlsManager, MockInputBackend
+from audio_processor import (
+    AudioProcessor, BandAnalyzer, Filterbank, SyntheticAudio, WavSource, analyze_wav
+)
+from pattern_manager import PATTERN_REGISTRY
+
+
+class BenchStrip(adafruit_pixelbuf.PixelBuf):
+    """Off-hardware strip with a real pixel buffer; transmitting is a no-op"""
+    def __init__(self, size, byteorder="GRB", brightness=0.5):
+        super().__init__(size, byteorder=byteorder, brightness=brightness, auto_write=False)
+
+    def _transmit(self, buffer):
+        pass
+
+
+def legacy_push(led_matrix):
+    """Original per-pixel push loop, kept for comparison"""
+    for y in range(led_matrix.height):
+        for x in range(led_matrix.width):
+            if y % 2 == 0:
+                pixel_index = y * led_matrix.width + x
+            else:
+                pixel_index = y * led_matrix.width + (led_matrix.width - 1 - x)
+
+            color = tuple(led_matrix.buffer[y, x])
+            led_matrix.output.strip[pixel_index] = color
+
+
+def time_per_frame(func, frames):
+    """Average milliseconds per call of func over the given number of frames"""
+    start = time.perf_counter()
+    for _ in range(frames):
+        func()
+    return (time.perf_counter() - start) * 1000.0 / frames
+
+
+def bench_led_push(sizes=((16, 16), (32, 32), (64, 64)), frames=200, byteorder="GRB"):
+    """Compare the per-pixel push loop against the bulk index-map push"""
+    print(f"LED push cost per frame ({byteorder})")
+    for width, height in sizes:
+        strip = BenchStrip(width * height, byteorder=byteorder)
+        led_matrix = LEDMatrix(
+            width=width, height=height,
+            output=NeoPixelOutput(None, width, height, strip=strip)
+        )
+        led_matrix.buffer[:] = np.random.randint(0, 256, led_matrix.buffer.shape)
+
+        before = time_per_frame(lambda: legacy_push(led_matrix), frames)
+        after = time_per_frame(led_matrix._push_frame, frames)
+        print(f"  {width}x{height}: per-pixel {before:.3f} ms, bulk {after:.3f} ms "
+              f"({before / after:.1f}x)")
+
+
+class TimedOutput(OutputBackend):
+    """Output that takes a fixed time per frame, like a strip clocking out its data
+    
+    By default it sleeps, like a driver binding that releases the GIL while
+    it waits. With hold_gil the time goes in one C call that keeps the GIL,
+    like a binding that doesn't (rpi_ws281x's render() is not known to
+    release it), so no Python code runs meanwhile.
+    """
+    def __init__(self, transmit_time, hold_gil=False):
+        super().__init__()
+        self.transmit_time = transmit_time
+        self.hold_gil = hold_gil
+        if hold_gil:
+            # sum() over a range runs entirely in C; size it to transmit_time
+            start = time.perf_counter()
+            sum(range(1000000))
+            self.spin_count = int(transmit_time / (time.perf_counter() - start) * 1000000)
+        
+    def write(self, frame):
+        if self.hold_gil:
+            sum(range(self.spin_count))
+        else:
+            time.sleep(self.transmit_time)
+        super().write(frame)
+
+
+def bench_pipelined_output(render_ms=8.0, transmit_ms=8.0, frames=100):
+    """Frame rate with transmission on the render thread versus pipelined on its own thread
+    
+    Pipelining only helps if the strip driver releases the GIL while it
+    transmits, so both kinds of driver are measured.
+    """
+    print(f"Render {render_ms} ms + transmit {transmit_ms} ms per frame")
+    
+    # Render work is a fixed amount of Python code rather than a deadline,
+    # so time spent waiting for the GIL isn't counted as rendering
+    start = time.perf_counter()
+    for _ in range(1000000):
+        pass
+    render_steps = int(render_ms / 1000 / (time.perf_counter() - start) * 1000000)
+    
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(0.001)  # As LEDCubeApp does when pipelined
+    for hold_gil in (False, True):
+        for pipelined in (False, True):
+            led_matrix = LEDMatrix(
+                output=TimedOutput(transmit_ms / 1000, hold_gil), pipelined=pipelined
+            )
+            
+            def frame():
+                # Busy render work, then a change so every frame is pushed
+                for _ in range(render_steps):
+                    pass
+                led_matrix.set_pixel(0, 0, ((int(led_matrix.buffer[0, 0, 0]) + 1) % 256, 0, 0))
+                led_matrix.update()
+                
+            cost = time_per_frame(frame, frames)
+            led_matrix.close()
+            print(f"  {'GIL held' if hold_gil else 'GIL released'}, "
+                  f"{'pipelined' if pipelined else 'sequential'}: {1000 / cost:.1f} FPS")
+    sys.setswitchinterval(switch_interval)
+
+
+def bench_input(detents=2000, presses=500):
+    """Edge callback cost and queue drain cost for scripted encoder turns and presses"""
+    print("Input handling (mock GPIO)")
+    backend = MockInputBackend()
+    controls = ControlsManager(backend=backend, debounce=0, queue_size=2 * detents + presses)
+    
+    start = time.perf_counter()
+    backend.turn(2, 3, detents)
+    backend.turn(2, 3, -detents)
+    for _ in range(presses):
+        backend.press(17)
+    edges = 2 * detents * 4 + presses * 2
+    edge_cost = (time.perf_counter() - start) * 1e6 / edges
+    
+    queued = len(controls.events)
+    start = time.perf_counter()
+    events = []
+    while controls.events:
+        events.extend(controls.drain())
+    drain_cost = (time.perf_counter() - start) * 1e6 / max(len(events), 1)
+    
+    turns = sum(value for kind, value, _ in events if kind == 'rotary')
+    print(f"  {edge_cost:.1f} us per edge, {drain_cost:.2f} us per drained event, "
+          f"{len(events)} events ({queued} queued, {controls.dropped} dropped), net turns {turns}")
+
+
+def legacy_band_analysis(audio_chunk, sample_rate, freq_bands):
+    """Original per-call FFT band extraction, kept for comparison"""
+    chunk_size = len(audio_chunk)
+    windowed = audio_chunk * np.hanning(chunk_size)
+    fft = np.fft.fft(windowed)
+    fft_data = np.abs(fft[:len(fft)//2])
+    freqs = np.fft.fftfreq(chunk_size, 1/sample_rate)[:chunk_size//2]
+
+    band_values = np.zeros(len(freq_bands))
+    for i, (low_freq, high_freq) in enumerate(freq_bands):
+        band_mask = (freqs >= low_freq) & (freqs < high_freq)
+        band_values[i] = np.mean(fft_data[band_mask]) if np.any(band_mask) else 0
+    return band_values
+
+
+def bench_band_analysis(chunk_sizes=(512, 1024, 2048), sample_rate=44100, frames=500):
+    """Analyses per second of the original band extraction and BandAnalyzer"""
+    print(f"FFT band analysis at {sample_rate} Hz")
+    for chunk_size in chunk_sizes:
+        audio_chunk = np.random.uniform(-1, 1, chunk_size).astype(np.float32)
+        filterbank = Filterbank(sample_rate, chunk_size)
+        freq_bands = filterbank.freq_bands
+        analyzer = BandAnalyzer(sample_rate, chunk_size, filterbank)
+
+        before = time_per_frame(
+            lambda: legacy_band_analysis(audio_chunk, sample_rate, freq_bands), frames
+        )
+        after = time_per_frame(lambda: analyzer.analyze(audio_chunk), frames)
+        print(f"  {chunk_size} samples: original {1000 / before:.0f}/s, "
+              f"planned {1000 / after:.0f}/s ({before / after:.1f}x)")
+
+
+def bench_filterbank(layouts=((16, 'log', 0.0), (32, 'mel', 0.5), (64, 'mel', 1.0), (64, 'bark', 1.0)),
+                     sample_rate=44100, chunk_size=2048, frames=2000):
+    """Cost of one filterbank product per frame for several band layouts"""
+    print(f"Filterbank cost ({chunk_size}-sample window)")
+    magnitudes = np.abs(np.fft.rfft(np.random.uniform(-1, 1, chunk_size)))[:chunk_size // 2]
+    for band_count, spacing, overlap in layouts:
+        filterbank = Filterbank(sample_rate, chunk_size, band_count, spacing, overlap)
+        cost = time_per_frame(lambda: filterbank.apply(magnitudes), frames)
+        print(f"  {band_count} {spacing} bands, overlap {overlap}: {cost * 1000:.1f} us "
+              f"({filterbank.weights.shape[1]} bins)")
+
+
+def bench_audio_pipeline(seconds=20, sample_rate=44100, bpm=128, seed=0):
+    """Full ingest/STFT/band/beat cost per hop on synthetic audio, and beat accuracy"""
+    print(f"Audio pipeline on {seconds} s of synthetic audio at {bpm} BPM")
+    for chunk_size, hop_size in ((1024, 512), (2048, 256)):
+        processor = AudioProcessor(sample_rate, chunk_size, hop_size, live=False)
+        source = SyntheticAudio(sample_rate, bpm=bpm, seed=seed)
+        beats = []
+        start = time.perf_counter()
+        for features in processor.analyze_blocks(source.blocks(seconds)):
+            if features.beat:
+                beats.append(features.stream_time)
+        elapsed = time.perf_counter() - start
+        beats = np.array(beats)
+        
+        # A kick counts as found if a beat was reported within 100 ms after it
+        expected = source.expected_beats
+        found = sum(np.any((beats >= kick) & (beats < kick + 0.1)) for kick in expected)
+        hops = int(seconds * sample_rate) // hop_size
+        print(f"  window {chunk_size}, hop {hop_size}: {elapsed * 1e6 / hops:.0f} us/hop, "
+              f"{found}/{len(expected)} kicks found, {len(beats) - found} extra beats, "
+              f"{processor.get_tempo():.1f} BPM")
+
+
+def write_test_wav(path, seconds=30, sample_rate=44100):
+    """Write a 16-bit mono WAV of synthetic audio"""
+    samples = SyntheticAudio(sample_rate).generate(int(seconds * sample_rate))
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((samples * 32767).astype('<i2').tobytes())
+
+
+def bench_offline_analysis(paths=()):
+    """Offline analysis speed in multiples of real time, saving each timeline next to its WAV"""
+    print("Offline WAV analysis")
+    if not paths:
+        path = os.path.join(tempfile.mkdtemp(), "test_tone.wav")
+        write_test_wav(path)
+        paths = [path]
+    for path in paths:
+        duration = WavSource(path).duration
+        start = time.perf_counter()
+        timeline = analyze_wav(path, os.path.splitext(path)[0] + ".features.npz")
+        elapsed = time.perf_counter() - start
+        print(f"  {os.path.basename(path)}: {duration:.1f} s of audio in {elapsed:.2f} s "
+              f"({duration / elapsed:.0f}x real time, {len(timeline['time'])} frames, "
+              f"{timeline['beat'].sum()} beats)")
+
+
+def bench_pattern_scaling(sizes=(16, 32, 64, 128), frames=60, warmup=3.0, sample_rate=44100):
+    """Render cost of every pattern on square panels of each size, fed synthetic audio
+    
+    Each pattern first renders warmup seconds of frames untimed, so the beat
+    detector is past its own warm-up and beat-driven patterns already have
+    something on screen when timing starts.
+    """
+    print("Pattern render cost per frame (ms)")
+    print(" " * 14 + "".join(f"{size}x{size}".rjust(9) for size in sizes))
+    block_size = sample_rate // 60  # One frame of audio at 60 FPS
+    warmup_frames = int(warmup * 60)
+    for name, pattern_class in PATTERN_REGISTRY.items():
+        costs = []
+        for size in sizes:
+            led_matrix = LEDMatrix(width=size, height=size, output=NullOutput())
+            processor = AudioProcessor(sample_rate, live=False)
+            seconds = (warmup_frames + frames) * block_size / sample_rate
+            blocks = SyntheticAudio(sample_rate).blocks(seconds, block_size)
+            if pattern_class.uses_audio:
+                pattern = pattern_class(led_matrix, processor)
+            else:
+                pattern = pattern_class(led_matrix)
+            
+            elapsed = 0.0
+            timed = 0
+            for frame, block in enumerate(blocks):
+                # Analyse this frame's audio outside the timed render
+                for _ in processor.analyze_blocks([block]):
+                    pass
+                start = time.perf_counter()
+                pattern.update()
+                led_matrix.update()
+                if frame >= warmup_frames:
+                    elapsed += time.perf_counter() - start
+                    timed += 1
+            costs.append(elapsed * 1000.0 / timed)
+        print(f"  {name:12s}" + "".join(f"{cost:9.2f}" for cost in costs))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # benchmarks.py track.wav ... - only analyse the given files
+        bench_offline_analysis(sys.argv[1:])
+    else:
+        bench_led_push()
+        bench_led_push(byteorder="GRBW")
+        bench_pipelined_output()
+        bench_input()
+        bench_pattern_scaling()
+        bench_band_analysis()
+        bench_filterbank()
+        bench_audio_pipeline()
+        bench_offline_analysis()
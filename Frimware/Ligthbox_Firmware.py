@@ -1,91 +1,229 @@
 # main.py - LED Cube Audio Visualizer Main Application
 import time
+START_TIME = time.monotonic()  # Startup timing reference
 import threading
 import signal
 import sys
 from led_controller import LEDMatrix
-from audio_processor import AudioProcessor
-from pattern_manager import PatternManager
+from led_outputs import NullOutput, RawVideoOutput, SharedMemoryOutput, TileLayout
+from audio_processor import AudioProcess, AudioProcessor
+from frame_scheduler import FrameScheduler
+from pattern_manager import BasePattern, PatternManager
+from profiler import Profiler
 from hardware_controls import ControlsManager
 from config import Config
+IMPORT_TIME = time.monotonic() - START_TIME
 
 class LEDCubeApp:
     def __init__(self):
         self.config = Config()
         self.running = True
+        self.profiler = Profiler()
+        self.wake_event = threading.Event()  # Ends an idle wait early
+        self.wake_on_beat = False  # Beats end the idle wait too (pattern waits for audio)
         
         # Initialize hardware components
+        width, height, output = self._create_display()
+        if self.config.PIPELINED_OUTPUT:
+            # Pass the GIL around more often (default 5 ms) so the output
+            # thread picks up each frame as soon as the last one is sent
+            sys.setswitchinterval(self.config.SWITCH_INTERVAL)
         self.led_matrix = LEDMatrix(
             pin=18, 
-            width=self.config.MATRIX_WIDTH, 
-            height=self.config.MATRIX_HEIGHT
+            width=width, 
+            height=height,
+            output=output,
+            pipelined=self.config.PIPELINED_OUTPUT
         )
         
-        self.audio_processor = AudioProcessor(
+        # Audio analysis in a thread, or in its own process on multi-core boards
+        audio_options = dict(
             sample_rate=self.config.SAMPLE_RATE,
-            chunk_size=self.config.CHUNK_SIZE
+            chunk_size=self.config.CHUNK_SIZE,
+            hop_size=self.config.HOP_SIZE,
+            band_count=self.config.BAND_COUNT,
+            band_spacing=self.config.BAND_SPACING,
+            band_overlap=self.config.BAND_OVERLAP,
+            on_beat=self._on_beat
         )
+        if self.config.AUDIO_PROCESS:
+            # The child times audio_analysis in its own profiler and shares it
+            self.audio_processor = AudioProcess(**audio_options)
+            self.profiler.add_source('audio_stages', self.audio_processor.get_stage_stats)
+        else:
+            self.audio_processor = AudioProcessor(profiler=self.profiler, **audio_options)
+        self.profiler.add_source('audio_latency', self.audio_processor.get_latency_stats)
+        self.profiler.add_source('audio_buffer', self.audio_processor.get_buffer_stats)
         
-        self.pattern_manager = PatternManager(self.led_matrix, self.audio_processor)
+        self.pattern_manager = PatternManager(self.led_matrix, self.audio_processor, self.profiler)
+        self.scheduler = FrameScheduler(self.config.FRAME_RATE)
+        self.profiler.add_source('frames', self.scheduler.get_stats)
+        self.profiler.add_source('led', self.led_matrix.get_frame_stats)
+        if hasattr(self.led_matrix.output, 'get_stats'):
+            self.profiler.add_source('output', self.led_matrix.output.get_stats)
         self.controls = ControlsManager(
             rotary_pins=(2, 3, 4),  # A, B, Button
-            button_pins=(17, 27)     # Button1, Button2
+            button_pins=(17, 27),    # Button1, Button2
+            on_event=self.wake_event.set
         )
         
         # Set up signal handlers for clean shutdown
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
         
+        # Seconds from main.py starting to each startup milestone
+        self.startup = {'imports': IMPORT_TIME, 'init': time.monotonic() - START_TIME}
+        self.profiler.add_source('startup', lambda: self.startup)
+        
+    def _create_display(self):
+        """Display size and output backend (see Config.OUTPUT_BACKEND)
+        
+        The size is the tiled wall if one is configured, else one strip.
+        A None output lets LEDMatrix open the strip itself.
+        """
+        kind, _, argument = self.config.OUTPUT_BACKEND.partition(':')
+        layout = None
+        if self.config.TILE_LAYOUT:
+            layout = TileLayout(*self.config.TILE_SIZE)
+            for tile in self.config.TILE_LAYOUT:
+                layout.add_tile(*tile)
+            width, height = layout.width, layout.height
+        else:
+            width, height = self.config.MATRIX_WIDTH, self.config.MATRIX_HEIGHT
+        
+        if kind == 'neopixel':
+            if layout is None:
+                return width, height, None
+            try:
+                output = layout.create_output(self.config.OUTPUT_PINS)
+            except Exception as e:
+                print(f"Warning: tiled output not available ({e}), using simulation mode")
+                output = NullOutput()
+        elif kind == 'null':
+            output = NullOutput()
+        elif kind == 'shm':
+            output = SharedMemoryOutput(width, height, name=argument or None)
+            print(f"Writing frames to shared memory '{output.name}'")
+        elif kind == 'rawvideo':
+            output = RawVideoOutput(argument or 'lightbox.rgb')
+            print(f"Writing frames to {output.path} (rgb24, {width}x{height})")
+        else:
+            raise ValueError(f"Unknown OUTPUT_BACKEND {self.config.OUTPUT_BACKEND!r}")
+        return width, height, output
+        
+    def _on_beat(self):
+        """Called by the audio processor for every beat, from its own thread"""
+        if self.wake_on_beat:
+            self.wake_event.set()
+        
     def signal_handler(self, signum, frame):
         print("\nShutting down gracefully...")
         self.running = False
+        self.wake_event.set()
         
     def handle_controls(self):
-        """Handle rotary encoder and button inputs"""
-        # Rotary encoder for pattern selection
-        if self.controls.rotary_changed():
-            direction = self.controls.get_rotary_direction()
-            if direction > 0:
-                self.pattern_manager.next_pattern()
-            elif direction < 0:
-                self.pattern_manager.previous_pattern()
+        """Apply queued rotary encoder and button events; returns True if there were any"""
+        events = self.controls.drain()
+        for kind, value, _ in events:
+            # Rotary encoder for pattern selection
+            if kind == 'rotary':
+                if value > 0:
+                    self.pattern_manager.next_pattern()
+                else:
+                    self.pattern_manager.previous_pattern()
+                    
+            # Rotary button for mode switching
+            elif kind == 'rotary_button':
+                self.pattern_manager.next_mode()
                 
-        # Rotary button for mode switching
-        if self.controls.rotary_button_pressed():
-            self.pattern_manager.next_mode()
-            
-        # Button 1 for brightness control
-        if self.controls.button1_pressed():
-            self.led_matrix.adjust_brightness(0.1)
-            
-        # Button 2 for settings
-        if self.controls.button2_pressed():
-            self.pattern_manager.toggle_settings()
+            # Button 1 for brightness control
+            elif kind == 'button1':
+                self.led_matrix.adjust_brightness(0.1)
+                
+            # Button 2 for settings
+            elif kind == 'button2':
+                self.pattern_manager.toggle_settings()
+                
+        self.profiler.count('input_events', len(events))
+        return bool(events)
+    
+    def _idle_until(self, next_change, beat_count):
+        """Sleep until next_change: a time.time() value, UNTIL_INPUT or UNTIL_AUDIO
+        
+        Input ends the wait early (the controls set wake_event). While the
+        pattern waits for audio, so does a beat (_on_beat sets it); beat_count
+        is the count as of the last render, so a beat since then doesn't wait.
+        """
+        if next_change is BasePattern.UNTIL_AUDIO:
+            self.wake_on_beat = True
+            if self.audio_processor.get_features().beat_count != beat_count:
+                self.wake_event.set()
+        if next_change in (BasePattern.UNTIL_INPUT, BasePattern.UNTIL_AUDIO):
+            timeout = None
+        else:
+            timeout = max(0.0, next_change - time.time())
+        if self.running:
+            self.wake_event.wait(timeout)
+        self.wake_on_beat = False
+        self.wake_event.clear()
+        self.scheduler.resync()
     
     def run(self):
         """Main application loop"""
         print("LED Cube Audio Visualizer Starting...")
         
-        # Start audio processing in separate thread
-        audio_thread = threading.Thread(target=self.audio_processor.start)
-        audio_thread.daemon = True
-        audio_thread.start()
+        # Start audio processing in separate thread (AudioProcess starts its own process)
+        if self.config.AUDIO_PROCESS:
+            self.audio_processor.start()
+        else:
+            audio_thread = threading.Thread(target=self.audio_processor.start)
+            audio_thread.daemon = True
+            audio_thread.start()
+        
+        # Metrics endpoint and periodic profile log
+        if self.config.PROFILER_PORT:
+            self.profiler.serve(self.config.PROFILER_PORT)
+        if self.config.PROFILER_LOG_INTERVAL:
+            self.profiler.start_logging(self.config.PROFILER_LOG_INTERVAL)
+        controls_stage = self.profiler.stage('controls')
+        render_stage = self.profiler.stage('render')
+        output_stage = self.profiler.stage('output')
+        idle_stage = self.profiler.stage('idle')
         
         print("System ready!")
         
         try:
+            first_frame = True
+            self.scheduler.start()
             while self.running:
                 # Handle user controls
-                self.handle_controls()
+                with controls_stage:
+                    self.handle_controls()
                 
                 # Update current pattern
-                self.pattern_manager.update()
+                beat_count = self.audio_processor.get_features().beat_count
+                with render_stage:
+                    self.pattern_manager.update()
                 
                 # Update LED matrix
-                self.led_matrix.update()
+                with output_stage:
+                    self.led_matrix.update()
+                    
+                if first_frame:
+                    first_frame = False
+                    self.startup['first_frame'] = time.monotonic() - START_TIME
+                    print(f"First frame {self.startup['first_frame']:.2f} s after start "
+                          f"(imports {self.startup['imports']:.2f} s, init {self.startup['init']:.2f} s)")
                 
-                # Control frame rate
-                time.sleep(1.0 / self.config.FRAME_RATE)
+                # Wait for the next frame deadline, or sleep while the
+                # pattern is static
+                next_change = self.pattern_manager.next_change()
+                if (next_change not in (BasePattern.UNTIL_INPUT, BasePattern.UNTIL_AUDIO) and
+                        next_change - time.time() < self.scheduler.frame_time):
+                    self.scheduler.wait()
+                else:
+                    with idle_stage:
+                        self._idle_until(next_change, beat_count)
                 
         except KeyboardInterrupt:
             pass
@@ -98,6 +236,14 @@ class LEDCubeApp:
         self.audio_processor.stop()
         self.led_matrix.clear()
         self.led_matrix.update()
+        self.led_matrix.close()
+        self.controls.close()
+        self.profiler.close()
+        
+        stats = self.scheduler.get_stats()
+        if stats:
+            print(f"Frames: {stats['fps']:.1f} FPS, {stats['jitter_ms']:.2f} ms jitter, "
+                  f"{stats['missed']} missed deadlines, {stats['dropped']} dropped")
         print("Shutdown complete.")
 
 if __name__ == "__main__":
@@ -106,52 +252,226 @@ if __name__ == "__main__":
 
 
 # led_controller.py - LED Matrix Management
-import board
-import neopixel
+import colorsys
 import numpy as np
 import time
+from led_outputs import NeoPixelOutput, NullOutput, ThreadedOutput
+
+def hue_wheel(h):
+    """Fully saturated, full value RGB (0-1 floats) for an array of hues"""
+    h = np.asarray(h, dtype=np.float64)
+    sector = np.floor(h * 6.0)
+    f = h * 6.0 - sector
+    sector = sector.astype(np.intp) % 6
+    one = np.ones_like(f)
+    zero = np.zeros_like(f)
+    rising = f
+    falling = 1.0 - f
+    r = np.choose(sector, [one, falling, zero, zero, rising, one])
+    g = np.choose(sector, [rising, one, one, falling, zero, zero])
+    b = np.choose(sector, [zero, zero, rising, one, one, falling])
+    return np.stack([r, g, b], axis=-1)
+
+def build_hue_lut(size=256):
+    """Quantized hue wheel: size entries of RGB (0-1 floats)"""
+    return hue_wheel(np.arange(size) / size)
+
+def hsv_to_rgb(h, s, v, hue_lut=None):
+    """Vectorized colorsys.hsv_to_rgb for whole arrays, returning uint8 RGB"""
+    if hue_lut is None:
+        wheel = hue_wheel(h)
+    else:
+        index = np.floor(np.asarray(h) * len(hue_lut)).astype(np.intp) % len(hue_lut)
+        wheel = hue_lut[index]
+    s = np.asarray(s, dtype=np.float64)[..., None]
+    v = np.asarray(v, dtype=np.float64)[..., None]
+    rgb = v * (1.0 - s * (1.0 - wheel))
+    return (rgb * 255).astype(np.uint8)
+
+class StencilCache:
+    """Cached distance fields and anti-aliased ring/disc coverage stencils
+    
+    Centres and radii are quantized to 1/subpixel_steps of a pixel so that
+    animated shapes reuse a small set of precomputed stencils.
+    """
+    def __init__(self, subpixel_steps=4, max_entries=1024):
+        self.subpixel_steps = subpixel_steps
+        self.max_entries = max_entries
+        self._distances = {}
+        self._stencils = {}
+        
+    def _remember(self, cache, key, value):
+        if len(cache) >= self.max_entries:
+            cache.clear()
+        cache[key] = value
+        return value
+        
+    def quantize(self, value):
+        """Split a coordinate into its whole pixel and quantized subpixel step"""
+        steps = int(round(value * self.subpixel_steps))
+        return steps // self.subpixel_steps, steps % self.subpixel_steps
+        
+    def distance_field(self, half_size, step_x=0, step_y=0):
+        """Distances of a (2 * half_size + 1)^2 box from its centre, shifted by subpixel steps"""
+        key = (half_size, step_x, step_y)
+        field = self._distances.get(key)
+        if field is None:
+            offsets = np.arange(-half_size, half_size + 1, dtype=np.float32)
+            dx = offsets - step_x / self.subpixel_steps
+            dy = offsets - step_y / self.subpixel_steps
+            field = np.sqrt(dx[None, :] ** 2 + dy[:, None] ** 2)
+            self._remember(self._distances, key, field)
+        return field
+        
+    def stencil(self, kind, cx, cy, radius, width=1.0):
+        """Coverage (0-1) of a 'ring' or 'disc' centred at (cx, cy)
+        
+        Returns (left, top, coverage) with coverage positioned at (left, top).
+        """
+        x, step_x = self.quantize(cx)
+        y, step_y = self.quantize(cy)
+        radius_steps = int(round(radius * self.subpixel_steps))
+        width_steps = int(round(width * self.subpixel_steps))
+        half_size = int(np.ceil(radius + width)) + 1
+        
+        key = (kind, half_size, step_x, step_y, radius_steps, width_steps)
+        coverage = self._stencils.get(key)
+        if coverage is None:
+            distance = self.distance_field(half_size, step_x, step_y)
+            radius = radius_steps / self.subpixel_steps
+            if kind == 'ring':
+                # Full coverage on the circle, fading out over width pixels
+                width = max(width_steps, 1) / self.subpixel_steps
+                coverage = np.clip(1.0 - np.abs(distance - radius) / width, 0.0, 1.0)
+            else:
+                # Solid disc with a one pixel anti-aliased edge
+                coverage = np.clip(radius + 0.5 - distance, 0.0, 1.0)
+            self._remember(self._stencils, key, coverage.astype(np.float32))
+        return x - half_size, y - half_size, coverage
+
 
 class LEDMatrix:
-    def __init__(self, pin=18, width=16, height=16, brightness=0.5):
+    def __init__(self, pin=18, width=16, height=16, brightness=0.5, output=None, pipelined=False):
         self.width = width
         self.height = height
         self.brightness = brightness
         
-        # Initialize NeoPixel strip
-        try:
-            self.pixels = neopixel.NeoPixel(
-                board.pin.Pin(pin), 
-                width * height, 
-                brightness=brightness,
-                auto_write=False
-            )
-        except:
-            # Fallback for testing without hardware
-            print("Warning: NeoPixel hardware not available, using simulation mode")
-            self.pixels = None
+        # Output backend - the NeoPixel strip unless another one is passed in
+        self.output = output
+        if self.output is None:
+            try:
+                self.output = NeoPixelOutput(pin, width, height)
+            except:
+                # Fallback for testing without hardware
+                print("Warning: NeoPixel hardware not available, using simulation mode")
+                self.output = NullOutput()
+        if pipelined:
+            # Transmit from a separate thread while the next frame renders
+            self.output = ThreadedOutput(self.output)
             
-        # Frame buffer - RGB values for each pixel
+        # Frame buffer - RGB values for each pixel. Drawing calls mark the
+        # rows they touch; prev_buffer holds what is currently on the strip.
         self.buffer = np.zeros((height, width, 3), dtype=np.uint8)
         self.prev_buffer = np.zeros((height, width, 3), dtype=np.uint8)
+        self._diff = np.zeros((height, width, 3), dtype=bool)
+        self._dirty_top = 0
+        self._dirty_bottom = height
+        
+        # Preallocated output frame, reused for every push. Outputs copy what
+        # they need out of it (ThreadedOutput into its own buffers) before
+        # write() returns, so one is enough.
+        self._frame = np.zeros((height, width, 3), dtype=np.uint8)
+        
+        # Output stage: one 256-entry table per channel combining gamma,
+        # brightness and white balance. The tables are stored back to back so
+        # a frame maps through them with a single gather; they are rebuilt
+        # only when one of the parameters changes.
+        self.gamma = 1.0
+        self.white_balance = (1.0, 1.0, 1.0)
+        self._output_lut = np.zeros(3 * 256, dtype=np.uint8)
+        self._channel_offsets = np.array([0, 256, 512], dtype=np.intp)
+        self._lut_index = np.zeros((height, width, 3), dtype=np.intp)
+        self._lut_stale = True
+        
+        # Frame statistics
+        self.dirty_frames = 0
+        self.clean_frames = 0
+        
+        # Optional quantized hue table for the array HSV calls (see use_hue_lut)
+        self.hue_lut = None
+        
+        # Distance fields and anti-aliased stencils for the circle primitives
+        self.stencils = StencilCache()
+        
+    def mark_dirty(self, top=0, bottom=None):
+        """Mark rows top..bottom-1 as changed (for code writing self.buffer directly)"""
+        if bottom is None:
+            bottom = self.height
+        self._dirty_top = min(self._dirty_top, max(0, top))
+        self._dirty_bottom = max(self._dirty_bottom, min(self.height, bottom))
         
     def set_pixel(self, x, y, color):
         """Set individual pixel color (x, y, (r, g, b))"""
         if 0 <= x < self.width and 0 <= y < self.height:
             self.buffer[y, x] = color
+            if y < self._dirty_top:
+                self._dirty_top = y
+            if y >= self._dirty_bottom:
+                self._dirty_bottom = y + 1
             
     def set_pixel_hsv(self, x, y, h, s, v):
         """Set pixel using HSV color space"""
-        import colorsys
         r, g, b = colorsys.hsv_to_rgb(h, s, v)
         self.set_pixel(x, y, (int(r * 255), int(g * 255), int(b * 255)))
     
+    def use_hue_lut(self, size=256):
+        """Quantize hues through a lookup table in the array HSV calls (None to disable)"""
+        self.hue_lut = build_hue_lut(size) if size else None
+    
+    def set_region_hsv(self, x, y, h, s, v, mask=None):
+        """Set a block of pixels from H/S/V arrays, top-left corner at (x, y)
+        
+        h, s and v (and mask, if given) broadcast to the block shape; only
+        pixels where mask is True are written. The block is clipped to the matrix.
+        """
+        if mask is None:
+            h, s, v = np.broadcast_arrays(h, s, v)
+        else:
+            h, s, v, mask = np.broadcast_arrays(h, s, v, mask)
+        block_height, block_width = h.shape
+        
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.width, x + block_width), min(self.height, y + block_height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        block = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        target = self.buffer[y0:y1, x0:x1]
+        
+        if mask is None:
+            target[:] = hsv_to_rgb(h[block], s[block], v[block], self.hue_lut)
+        else:
+            selected = mask[block]
+            target[selected] = hsv_to_rgb(
+                h[block][selected], s[block][selected], v[block][selected], self.hue_lut
+            )
+        self.mark_dirty(y0, y1)
+    
+    def fill_hsv(self, h, s, v, mask=None):
+        """Fill the matrix from H/S/V planes (anything broadcasting to height x width)"""
+        shape = (self.height, self.width)
+        if mask is not None:
+            mask = np.broadcast_to(mask, shape)
+        self.set_region_hsv(0, 0, np.broadcast_to(h, shape), s, v, mask)
+    
     def fill(self, color):
         """Fill entire matrix with color"""
         self.buffer[:, :] = color
+        self.mark_dirty()
         
     def clear(self):
         """Clear the matrix (set all pixels to black)"""
         self.buffer.fill(0)
+        self.mark_dirty()
         
     def draw_line(self, x0, y0, x1, y1, color):
         """Draw line using Bresenham's algorithm"""
@@ -159,115 +479,1101 @@ class LEDMatrix:
         dy = abs(y1 - y0)
         sx = 1 if x0 < x1 else -1
         sy = 1 if y0 < y1 else -1
-        err = dx - dy
         
-        x, y = x0, y0
-        while True:
-            self.set_pixel(x, y, color)
-            if x == x1 and y == y1:
-                break
-            e2 = 2 * err
-            if e2 > -dy:
-                err -= dy
-                x += sx
-            if e2 < dx:
-                err += dx
-                y += sy
+        # Closed form of the Bresenham walk: one step along the major axis per
+        # pixel, minor axis rounded with the same tie-breaking as the loop
+        if dx >= dy:
+            steps = np.arange(dx + 1)
+            xs = x0 + sx * steps
+            ys = y0 + sy * ((2 * steps * dy + dx - 1) // (2 * dx)) if dx else steps + y0
+        else:
+            steps = np.arange(dy + 1)
+            ys = y0 + sy * steps
+            xs = x0 + sx * ((2 * steps * dx + dy - 1) // (2 * dy))
+        
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        if inside.any():
+            ys = ys[inside]
+            self.buffer[ys, xs[inside]] = color
+            self.mark_dirty(int(ys.min()), int(ys.max()) + 1)
                 
     def draw_circle(self, cx, cy, radius, color, filled=False):
         """Draw circle"""
-        for y in range(max(0, cy - radius), min(self.height, cy + radius + 1)):
-            for x in range(max(0, cx - radius), min(self.width, cx + radius + 1)):
-                dist = ((x - cx) ** 2 + (y - cy) ** 2) ** 0.5
-                if filled and dist <= radius:
-                    self.set_pixel(x, y, color)
-                elif not filled and abs(dist - radius) < 0.7:
-                    self.set_pixel(x, y, color)
+        distance = self.stencils.distance_field(radius)
+        if filled:
+            mask = distance <= radius
+        else:
+            mask = np.abs(distance - radius) < 0.7
+        self._blit_mask(cx - radius, cy - radius, mask, color)
+        
+    def draw_ring(self, cx, cy, radius, color, alpha=1.0, width=1.0):
+        """Draw an anti-aliased ring, blended over the existing pixels"""
+        left, top, coverage = self.stencils.stencil('ring', cx, cy, radius, width)
+        self.blend_stencil(left, top, coverage, color, alpha)
+        
+    def draw_disc(self, cx, cy, radius, color, alpha=1.0):
+        """Draw an anti-aliased filled circle, blended over the existing pixels"""
+        left, top, coverage = self.stencils.stencil('disc', cx, cy, radius)
+        self.blend_stencil(left, top, coverage, color, alpha)
+        
+    def _clip_block(self, left, top, shape):
+        """Clip a block at (left, top) to the matrix: (matrix slices, block slices) or None"""
+        x0, y0 = max(0, left), max(0, top)
+        x1, y1 = min(self.width, left + shape[1]), min(self.height, top + shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return ((slice(y0, y1), slice(x0, x1)),
+                (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left)))
+        
+    def _blit_mask(self, left, top, mask, color):
+        """Set the pixels of a boolean mask positioned at (left, top)"""
+        clipped = self._clip_block(left, top, mask.shape)
+        if clipped is None:
+            return
+        target, block = clipped
+        self.buffer[target][mask[block]] = color
+        self.mark_dirty(target[0].start, target[0].stop)
+        
+    def blend_stencil(self, left, top, coverage, color, alpha=1.0):
+        """Blend color over the pixels of a coverage stencil positioned at (left, top)"""
+        clipped = self._clip_block(left, top, coverage.shape)
+        if clipped is None:
+            return
+        target, block = clipped
+        region = self.buffer[target]
+        weight = coverage[block][..., None] * alpha
+        region[:] = region + (np.asarray(color, dtype=np.float32) - region) * weight
+        self.mark_dirty(target[0].start, target[0].stop)
     
     def adjust_brightness(self, delta):
         """Adjust overall brightness"""
         self.brightness = max(0.1, min(1.0, self.brightness + delta))
-        if self.pixels:
-            self.pixels.brightness = self.brightness
+        self._lut_stale = True
+            
+    def set_gamma(self, gamma):
+        """Set output gamma (1.0 = linear)"""
+        self.gamma = gamma
+        self._lut_stale = True
+        
+    def set_white_balance(self, red=1.0, green=1.0, blue=1.0):
+        """Set per-channel output trim (0-1) to calibrate the LEDs' white point"""
+        self.white_balance = (red, green, blue)
+        self._lut_stale = True
             
     def apply_gamma_correction(self):
-        """Apply gamma correction for better color representation"""
-        gamma = 2.2
-        self.buffer = np.power(self.buffer / 255.0, 1.0 / gamma) * 255
-        self.buffer = self.buffer.astype(np.uint8)
+        """Apply gamma correction for better color representation
+        
+        Only the output stage is affected; the frame buffer patterns draw
+        into (and read back) is left untouched.
+        """
+        self.set_gamma(2.2)
+        
+    def _build_output_lut(self):
+        """Rebuild the per-channel output tables from gamma, brightness and white balance"""
+        levels = np.power(np.arange(256) / 255.0, 1.0 / self.gamma) * 255 * self.brightness
+        for channel, trim in enumerate(self.white_balance):
+            table = np.clip(levels * trim, 0, 255).astype(np.uint8)
+            self._output_lut[channel * 256:(channel + 1) * 256] = table
+        self._lut_stale = False
+    
+    def _push_frame(self):
+        """Map the buffer through the output tables into the output frame and write it out"""
+        if self._lut_stale:
+            self._build_output_lut()
+        np.add(self.buffer, self._channel_offsets, out=self._lut_index)
+        np.take(self._output_lut, self._lut_index, out=self._frame, mode='clip')
+        self.output.write(self._frame)
+    
+    def _rows_changed(self, top, bottom):
+        """Compare dirty rows against the pushed frame, syncing prev_buffer if they differ"""
+        if top >= bottom:
+            return False
+        diff = self._diff[top:bottom]
+        np.not_equal(self.buffer[top:bottom], self.prev_buffer[top:bottom], out=diff)
+        if not diff.any():
+            return False
+        np.copyto(self.prev_buffer[top:bottom], self.buffer[top:bottom])
+        return True
+    
+    def get_frame_stats(self):
+        """Get counts of pushed (dirty) and skipped (clean) frames"""
+        return {
+            'dirty_frames': self.dirty_frames,
+            'clean_frames': self.clean_frames
+        }
     
     def update(self):
-        """Push buffer to physical LEDs"""
-        if self.pixels is None:
-            return  # Simulation mode
+        """Push buffer to physical LEDs if anything changed since the last push"""
+        top, bottom = self._dirty_top, self._dirty_bottom
+        self._dirty_top, self._dirty_bottom = self.height, 0
+        
+        changed = self._rows_changed(top, bottom)
+        if not (changed or self._lut_stale):
+            self.clean_frames += 1
+            return
+        
+        self.dirty_frames += 1
+        self._push_frame()
+        
+    def close(self):
+        """Release the output backend"""
+        self.output.close()
+
+
+# led_outputs.py - LED Output Backends
+import numpy as np
+import queue
+import threading
+import time
+
+def serpentine_map(width, height):
+    """Physical pixel order of a zigzag wired matrix (odd rows reversed)"""
+    index_map = np.arange(width * height).reshape(height, width)
+    index_map[1::2] = index_map[1::2, ::-1]
+    return index_map.ravel()
+
+
+class OutputBackend:
+    """Destination for finished frames
+    
+    write() receives a (height, width, 3) uint8 RGB frame that has already
+    been through the output stage. The frame buffer is reused by LEDMatrix,
+    so backends must copy anything they want to keep.
+    """
+    def __init__(self):
+        self.frames_written = 0
+        
+    def write(self, frame):
+        """Override in subclasses"""
+        self.frames_written += 1
+        
+    def close(self):
+        """Override in subclasses that hold resources"""
+        pass
+
+
+class NullOutput(OutputBackend):
+    """Discards frames (simulation mode and render benchmarks)"""
+    pass
+
+
+class NeoPixelOutput(OutputBackend):
+    """NeoPixel strip fed by one gather from the frame into its byte buffer"""
+    def __init__(self, pin, width, height, index_map=None, strip=None):
+        super().__init__()
+        if index_map is None:
+            index_map = serpentine_map(width, height)
+        
+        # Brightness is applied by LEDMatrix's output tables, so the strip
+        # itself always runs at full brightness
+        self.strip = strip
+        if self.strip is None:
+            import board
+            import neopixel
+            self.strip = neopixel.NeoPixel(
+                board.pin.Pin(pin),
+                len(index_map),
+                brightness=1.0,
+                auto_write=False
+            )
+        self.strip.brightness = 1.0
+        self.index_map = index_map
+        self._bind_strip()
+        
+    def _bind_strip(self):
+        """Precompute the strip byte -> frame byte table for the PixelBuf buffer"""
+        self._strip_bytes = None
+        try:
+            step = self.strip._pixel_step
+            byteorder = self.strip._byteorder
+            raw = np.frombuffer(
+                self.strip._post_brightness_buffer, dtype=np.uint8,
+                count=len(self.index_map) * step,
+                offset=self.strip._offset
+            )
+        except AttributeError:
+            return  # Driver without a byte buffer
+        
+        # Byte k of strip pixel i comes from channel c of frame pixel index_map[i]
+        byte_index = np.zeros((len(self.index_map), step), dtype=np.intp)
+        for channel, slot in enumerate(byteorder[:3]):
+            byte_index[:, slot] = self.index_map * 3 + channel
+        self._byte_index = byte_index.ravel()
+        self._white_slots = list(byteorder[3:])
+        self._strip_bytes = raw
+        self._strip_pixels = raw.reshape(-1, step)
+        
+    def write(self, frame):
+        """Write a frame to the strip and clock it out"""
+        super().write(frame)
+        if self._strip_bytes is None:
+            # Strip driver without a pixelbuf byte buffer - set pixels one by one
+            strip_frame = frame.reshape(-1, 3)[self.index_map]
+            for i, color in enumerate(strip_frame.tolist()):
+                self.strip[i] = tuple(color)
+        else:
+            np.take(frame.reshape(-1), self._byte_index, out=self._strip_bytes, mode='clip')
+            for slot in self._white_slots:
+                self._strip_pixels[:, slot] = 0
+        self.strip.show()
+        
+    def close(self):
+        self.strip.fill((0, 0, 0))
+        self.strip.show()
+
+
+class Ws281xOutput(OutputBackend):
+    """Two LED chains driven by one rpi_ws281x controller
+    
+    Blinka's NeoPixel driver runs a single ws281x strip per process, so a
+    wall on two channels uses the controller's two PWM channels directly:
+    channel 0 on a PWM0 pin (12 or 18) and channel 1 on a PWM1 pin (13 or
+    19). Both chains go out in one render() call. index_maps holds, per
+    channel, the frame pixel of each position in that chain.
+    """
+    CHANNEL_PINS = ((12, 18), (13, 19))
+    
+    def __init__(self, pins, index_maps, dma=10, frequency=800000):
+        super().__init__()
+        for channel in index_maps:
+            if channel >= len(self.CHANNEL_PINS):
+                raise ValueError(f"rpi_ws281x drives channels 0 and 1 only, got channel {channel}")
+            if pins[channel] not in self.CHANNEL_PINS[channel]:
+                raise ValueError(f"Channel {channel} needs a PWM{channel} pin "
+                                 f"{self.CHANNEL_PINS[channel]}, got {pins[channel]}")
+        
+        import _rpi_ws281x as ws
+        self.ws = ws
+        self.leds = ws.new_ws2811_t()
+        self.channels = []  # (channel handle, index map) of each used channel
+        for channel in range(len(self.CHANNEL_PINS)):
+            handle = ws.ws2811_channel_get(self.leds, channel)
+            index_map = index_maps.get(channel)
+            ws.ws2811_channel_t_count_set(handle, 0 if index_map is None else len(index_map))
+            ws.ws2811_channel_t_gpionum_set(handle, 0 if index_map is None else pins[channel])
+            ws.ws2811_channel_t_invert_set(handle, 0)
+            ws.ws2811_channel_t_brightness_set(handle, 255)
+            ws.ws2811_channel_t_strip_type_set(handle, ws.WS2811_STRIP_GRB)
+            if index_map is not None:
+                self.channels.append((handle, index_map))
+        ws.ws2811_t_freq_set(self.leds, frequency)
+        ws.ws2811_t_dmanum_set(self.leds, dma)
+        
+        # Fail here rather than on the first frame, so the caller can fall back
+        result = ws.ws2811_init(self.leds)
+        if result != ws.WS2811_SUCCESS:
+            ws.delete_ws2811_t(self.leds)
+            self.leds = None
+            raise RuntimeError(f"ws2811_init failed: {ws.ws2811_get_return_t_str(result)}")
+        
+        # Frame pixels packed as 0x00RRGGBB, the driver's color format
+        self._packed = None
+        
+    def write(self, frame):
+        """Pack the frame once, load each chain from its index table and render both"""
+        super().write(frame)
+        pixels = frame.reshape(-1, 3)
+        if self._packed is None:
+            self._packed = np.zeros(len(pixels), dtype=np.uint32)
+        packed = self._packed
+        np.left_shift(pixels[:, 0], 16, out=packed, dtype=np.uint32)
+        packed |= pixels[:, 1].astype(np.uint32) << 8
+        packed |= pixels[:, 2]
+        
+        # The driver only offers per-LED setters
+        for handle, index_map in self.channels:
+            for i, color in enumerate(packed[index_map].tolist()):
+                self.ws.ws2811_led_set(handle, i, color)
+        result = self.ws.ws2811_render(self.leds)
+        if result != self.ws.WS2811_SUCCESS:
+            raise RuntimeError(f"ws2811_render failed: {self.ws.ws2811_get_return_t_str(result)}")
+        
+    def close(self):
+        if self.leds is None:
+            return
+        for handle, index_map in self.channels:
+            for i in range(len(index_map)):
+                self.ws.ws2811_led_set(handle, i, 0)
+        self.ws.ws2811_render(self.leds)
+        self.ws.ws2811_fini(self.leds)
+        self.ws.delete_ws2811_t(self.leds)
+        self.leds = None
+
+
+class SharedMemoryOutput(OutputBackend):
+    """Ring of frames in shared memory for local viewers and tests
+    
+    Layout: a header of four uint64 (frames written, width, height, slots)
+    followed by slots frames of height x width x 3 bytes. Readers attach with
+    SharedMemoryReader and get views into the ring without copying.
+    """
+    HEADER_BYTES = 64
+    
+    def __init__(self, width, height, name=None, slots=8):
+        from multiprocessing import shared_memory
+        super().__init__()
+        frame_bytes = width * height * 3
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=True, size=self.HEADER_BYTES + slots * frame_bytes
+        )
+        self.name = self.shm.name
+        self.header, self.ring = _map_frame_ring(self.shm.buf, width, height, slots)
+        self.header[:] = (0, width, height, slots)
+        
+    def write(self, frame):
+        """Copy the frame into the next slot, then publish it by bumping the count"""
+        count = int(self.header[0])
+        np.copyto(self.ring[count % len(self.ring)], frame)
+        self.header[0] = count + 1
+        super().write(frame)
+        
+    def close(self):
+        self.header = self.ring = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedMemoryReader:
+    """Reader side of a SharedMemoryOutput ring"""
+    def __init__(self, name):
+        from multiprocessing import shared_memory
+        self.shm = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((4,), dtype=np.uint64, buffer=self.shm.buf)
+        width, height, slots = (int(value) for value in header[1:])
+        self.header, self.ring = _map_frame_ring(self.shm.buf, width, height, slots)
+        
+    @property
+    def frames_written(self):
+        return int(self.header[0])
+        
+    def frame(self, number):
+        """View of frame number (0-based); valid until the writer laps the ring"""
+        return self.ring[number % len(self.ring)]
+        
+    def latest(self):
+        """(frame number, view) of the newest frame, or (None, None) before the first"""
+        count = self.frames_written
+        if count == 0:
+            return None, None
+        return count - 1, self.frame(count - 1)
+        
+    def close(self):
+        self.header = self.ring = None
+        self.shm.close()
+
+
+def _map_frame_ring(buf, width, height, slots):
+    """Header and (slots, height, width, 3) frame views over a shared buffer"""
+    header = np.ndarray((4,), dtype=np.uint64, buffer=buf)
+    ring = np.ndarray(
+        (slots, height, width, 3), dtype=np.uint8,
+        buffer=buf, offset=SharedMemoryOutput.HEADER_BYTES
+    )
+    return header, ring
+
+
+class ThreadedOutput(OutputBackend):
+    """Transmits frames from a background thread so rendering overlaps transmission
+    
+    write() copies the frame into a free buffer and hands it to the output
+    thread. There are only depth buffers in flight: once they are all
+    queued or transmitting, write() blocks until the thread hands one
+    back, so a slow strip throttles rendering instead of frames piling up.
+    With the default depth of 1, frame N+1 renders while frame N goes out.
+    """
+    def __init__(self, output, depth=1):
+        super().__init__()
+        self.output = output
+        self.depth = depth
+        self.free = queue.Queue()     # Buffers ready to be filled
+        self.pending = queue.Queue()  # Filled buffers waiting for the output thread
+        self.allocated = False
+        
+        self.stall_time = 0.0     # Seconds write() spent waiting for a free buffer
+        self.transmit_time = 0.0  # Seconds the output thread spent in output.write()
+        self.errors = 0
+        
+        self.thread = threading.Thread(target=self._transmit_loop, name='led-output', daemon=True)
+        self.thread.start()
+        
+    def write(self, frame):
+        """Queue a copy of the frame, waiting for a free buffer if all are in flight"""
+        if not self.allocated:
+            # Sized from the first frame
+            for _ in range(self.depth):
+                self.free.put(np.empty_like(frame))
+            self.allocated = True
             
-        # Only update changed pixels for efficiency
-        if not np.array_equal(self.buffer, self.prev_buffer):
-            # Convert 2D buffer to 1D pixel array
-            for y in range(self.height):
-                for x in range(self.width):
-                    # Handle zigzag LED strip layout
-                    if y % 2 == 0:
-                        pixel_index = y * self.width + x
-                    else:
-                        pixel_index = y * self.width + (self.width - 1 - x)
-                    
-                    color = tuple(self.buffer[y, x])
-                    self.pixels[pixel_index] = color
+        start = time.monotonic()
+        buffer = self.free.get()
+        self.stall_time += time.monotonic() - start
+        
+        np.copyto(buffer, frame)
+        self.pending.put(buffer)
+        super().write(frame)
+        
+    def _transmit_loop(self):
+        while True:
+            buffer = self.pending.get()
+            if buffer is None:
+                break
+            start = time.monotonic()
+            try:
+                self.output.write(buffer)
+            except Exception as e:
+                if self.errors == 0:
+                    print(f"Warning: LED output failed ({e})")
+                self.errors += 1
+            self.transmit_time += time.monotonic() - start
+            self.free.put(buffer)
             
-            self.pixels.show()
-            self.prev_buffer = self.buffer.copy()
+    def get_stats(self):
+        """Seconds spent stalled on backpressure and transmitting, and error count"""
+        return {
+            'stall_time': self.stall_time,
+            'transmit_time': self.transmit_time,
+            'errors': self.errors
+        }
+        
+    def close(self):
+        """Send the queued frames, stop the output thread and close the output"""
+        self.pending.put(None)
+        self.thread.join()
+        self.output.close()
+
+
+class MultiOutput(OutputBackend):
+    """Fans each frame out to several output channels"""
+    def __init__(self, outputs):
+        super().__init__()
+        self.outputs = list(outputs)
+        
+    def write(self, frame):
+        for output in self.outputs:
+            output.write(frame)
+        super().write(frame)
+        
+    def close(self):
+        for output in self.outputs:
+            output.close()
+
+
+class TileLayout:
+    """Display wall built from serpentine tiles, compiled to flat index tables
+    
+    Tiles are added in chain order. Each tile sits with its top-left corner
+    at pixel (x, y) of the wall, on an output channel, optionally rotated
+    clockwise by a multiple of 90 degrees and/or mirrored. compile() turns
+    the layout into one strip position -> frame pixel table per channel, so
+    a channel costs one gather per frame however many tiles it drives.
+    """
+    def __init__(self, tile_width=16, tile_height=16):
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.tiles = []
+        
+    def add_tile(self, x, y, channel=0, rotation=0, flip_x=False, flip_y=False):
+        """Append a tile to the end of a channel's chain"""
+        if rotation % 90:
+            raise ValueError(f"Tile rotation must be a multiple of 90, got {rotation}")
+        self.tiles.append((x, y, channel, rotation % 360, flip_x, flip_y))
+        
+    def _footprint(self, rotation, flip_x, flip_y):
+        """Local pixel index shown at each position of a placed tile"""
+        local = np.arange(self.tile_width * self.tile_height).reshape(
+            self.tile_height, self.tile_width
+        )
+        if flip_x:
+            local = local[:, ::-1]
+        if flip_y:
+            local = local[::-1, :]
+        return np.rot90(local, -(rotation // 90))
+        
+    @property
+    def width(self):
+        return max(x + self._footprint(r, False, False).shape[1] for x, _, _, r, _, _ in self.tiles)
+        
+    @property
+    def height(self):
+        return max(y + self._footprint(r, False, False).shape[0] for _, y, _, r, _, _ in self.tiles)
+        
+    def compile(self):
+        """Per-channel index tables: {channel: frame pixel of each strip position}"""
+        width, height = self.width, self.height
+        chain_order = serpentine_map(self.tile_width, self.tile_height)
+        covered = np.zeros(width * height, dtype=bool)
+        chains = {}
+        
+        for x, y, channel, rotation, flip_x, flip_y in self.tiles:
+            footprint = self._footprint(rotation, flip_x, flip_y)
+            if x < 0 or y < 0:
+                raise ValueError(f"Tile at ({x}, {y}) is outside the wall")
+            rows, cols = np.indices(footprint.shape)
+            
+            # Wall pixel of each local pixel, then of each position in the chain
+            wall_index = np.empty(footprint.size, dtype=np.intp)
+            wall_index[footprint.ravel()] = ((rows + y) * width + (cols + x)).ravel()
+            wall_index = wall_index[chain_order]
+            
+            if covered[wall_index].any():
+                raise ValueError(f"Tile at ({x}, {y}) overlaps another tile")
+            covered[wall_index] = True
+            chains.setdefault(channel, []).append(wall_index)
+            
+        return {channel: np.concatenate(parts) for channel, parts in chains.items()}
+        
+    def create_output(self, pins):
+        """Output for the wall, channel n on pins[n]
+        
+        A single channel is one NeoPixel strip. Blinka's NeoPixel driver
+        can't run two strips in one process, so two channels go through
+        one rpi_ws281x controller (Ws281xOutput) instead.
+        """
+        index_maps = self.compile()
+        if len(index_maps) == 1:
+            (channel, index_map), = index_maps.items()
+            return NeoPixelOutput(pins[channel], self.width, self.height, index_map=index_map)
+        return Ws281xOutput(pins, index_maps)
+
+
+class RawVideoOutput(OutputBackend):
+    """Appends frames to a raw rgb24 video file
+    
+    Play back with: ffplay -f rawvideo -pixel_format rgb24 -video_size WxH file
+    """
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.file = open(path, 'wb')
+        
+    def write(self, frame):
+        frame.tofile(self.file)
+        super().write(frame)
+        
+    def close(self):
+        self.file.close()
 
 
 # audio_processor.py - Audio Analysis
 import numpy as np
-import pyaudio
+import signal
 import threading
-from scipy import signal
-from collections import deque
 import time
+import wave
+from profiler import Profiler
 
-class AudioProcessor:
-    def __init__(self, sample_rate=44100, chunk_size=1024):
+class SampleRingBuffer:
+    """Preallocated ring of float32 samples between the capture callback and analysis
+    
+    The callback copies whole blocks in with write(); the analysis side
+    copies a contiguous window out with latest() or read(). A short lock
+    around each copy keeps the two threads consistent.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.lock = threading.Lock()
+        
+        self.write_count = 0  # Samples ever written
+        self.read_count = 0   # Samples ever handed to the reader
+        self.overruns = 0     # Samples overwritten before the reader saw them
+        self.underruns = 0    # Reads that asked for more samples than were there
+        
+    def write(self, samples):
+        """Copy a block of samples in, overwriting the oldest ones if full"""
+        count = len(samples)
+        if count > self.capacity:
+            samples = samples[-self.capacity:]
+        with self.lock:
+            start = (self.write_count + count - len(samples)) % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self.data[start:start + first] = samples[:first]
+            self.data[:len(samples) - first] = samples[first:]
+            self.write_count += count
+            
+            unread = self.write_count - self.read_count
+            if unread > self.capacity:
+                self.overruns += unread - self.capacity
+                self.read_count = self.write_count - self.capacity
+                
+    @property
+    def available(self):
+        """Samples written since the reader last caught up"""
+        return self.write_count - self.read_count
+        
+    def _copy_out(self, end, count, out):
+        """Copy the count samples ending at absolute position end into out"""
+        start = (end - count) % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        out[first:count] = self.data[:count - first]
+        
+    def latest(self, count, out):
+        """Copy the newest count samples into out and mark everything as read"""
+        with self.lock:
+            if count > min(self.write_count, self.capacity):
+                self.underruns += 1
+                return False
+            self._copy_out(self.write_count, count, out)
+            self.read_count = self.write_count
+        return True
+        
+    def read(self, count, out):
+        """Copy the oldest count unread samples into out and consume them"""
+        with self.lock:
+            if count > self.available:
+                self.underruns += 1
+                return False
+            self._copy_out(self.read_count + count, count, out)
+            self.read_count += count
+        return True
+        
+    def get_stats(self):
+        """Get overrun/underrun counters"""
+        return {
+            'written': self.write_count,
+            'overruns': self.overruns,
+            'underruns': self.underruns
+        }
+
+
+class Filterbank:
+    """Band levels from an FFT magnitude spectrum via a precomputed weight matrix
+    
+    Band edges are spaced evenly on a log, mel or bark scale between
+    min_freq and max_freq. With overlap 0 each band is the mean magnitude of
+    the bins in [low, high), as the original 16 log bands were; overlap 1
+    gives triangular filters reaching to the neighbouring band centres.
+    Weights only cover the bins between the lowest and highest edge, so
+    each frame costs one matrix-vector product over that span.
+    """
+    SCALES = {
+        # name: (Hz -> scale, scale -> Hz)
+        'log': (np.log, np.exp),
+        'mel': (lambda f: 2595.0 * np.log10(1.0 + f / 700.0),
+                lambda m: 700.0 * (10.0 ** (m / 2595.0) - 1.0)),
+        'bark': (lambda f: 26.81 * f / (1960.0 + f) - 0.53,
+                 lambda z: 1960.0 * (z + 0.53) / (26.28 - z))
+    }
+    
+    def __init__(self, sample_rate, chunk_size, band_count=16, spacing='log', overlap=0.0,
+                 min_freq=20, max_freq=20000):
+        if spacing not in self.SCALES:
+            raise ValueError(f"Unknown band spacing: {spacing}")
+        to_scale, from_scale = self.SCALES[spacing]
+        max_freq = min(max_freq, sample_rate // 2)
+        self.band_count = band_count
+        self.spacing = spacing
+        self.overlap = overlap
+        
+        # Band edges, evenly spaced on the chosen scale
+        scale_edges = np.linspace(to_scale(min_freq), to_scale(max_freq), band_count + 1)
+        edges = from_scale(scale_edges)
+        edges[[0, -1]] = min_freq, max_freq
+        self.freq_bands = list(zip(edges[:-1], edges[1:]))
+        
+        freqs = np.fft.rfftfreq(chunk_size, 1 / sample_rate)[:chunk_size // 2]
+        lows, highs = edges[:-1, None], edges[1:, None]
+        if overlap > 0:
+            # Trapezoids on the band scale with ramps overlap band-widths wide,
+            # centred on the edges
+            position = to_scale(np.maximum(freqs, 1e-3))[None, :]
+            ramp = overlap * np.diff(scale_edges)[:, None]
+            rising = (position - (scale_edges[:-1, None] - ramp / 2)) / ramp
+            falling = ((scale_edges[1:, None] + ramp / 2) - position) / ramp
+            weights = np.clip(np.minimum(rising, falling), 0.0, 1.0)
+            weights[:, freqs <= 0] = 0.0
+        else:
+            weights = ((freqs >= lows) & (freqs < highs)).astype(np.float64)
+            
+        # Normalise each band to a weighted mean; bands without bins stay 0
+        totals = weights.sum(axis=1, keepdims=True)
+        np.divide(weights, totals, out=weights, where=totals > 0)
+        
+        used = np.flatnonzero(weights.any(axis=0))
+        self.bin_start = used[0] if len(used) else 0
+        self.bin_end = used[-1] + 1 if len(used) else 0
+        self.weights = np.ascontiguousarray(weights[:, self.bin_start:self.bin_end])
+        self.band_values = np.zeros(band_count)
+        
+    def apply(self, magnitudes):
+        """Band levels for one magnitude spectrum"""
+        np.dot(self.weights, magnitudes[self.bin_start:self.bin_end], out=self.band_values)
+        return self.band_values
+
+
+class BandAnalyzer:
+    """Real-FFT band analysis with the window and filterbank planned once"""
+    def __init__(self, sample_rate, chunk_size, filterbank):
         self.sample_rate = sample_rate
         self.chunk_size = chunk_size
+        self.bin_count = chunk_size // 2
+        self.window = np.hanning(chunk_size)
+        self.filterbank = filterbank
+        
+        # Preallocated work arrays
+        self.windowed = np.zeros(chunk_size)
+        self.magnitudes = np.zeros(self.bin_count)
+        
+    def analyze(self, audio_chunk):
+        """FFT magnitudes and band levels for one chunk"""
+        np.multiply(audio_chunk, self.window, out=self.windowed)
+        spectrum = np.fft.rfft(self.windowed)
+        np.abs(spectrum[:self.bin_count], out=self.magnitudes)
+        return self.filterbank.apply(self.magnitudes)
+
+
+class SlidingWindow:
+    """STFT analysis window advanced one hop at a time
+    
+    Samples live in a buffer twice the window length. Each hop is written
+    after the current window, so the window stays a contiguous view and
+    only moves back to the start of the buffer once per window's worth of
+    hops, rather than being rebuilt from the sample history every hop.
+    """
+    def __init__(self, size, hop):
+        self.size = size
+        self.hop = hop
+        self.buffer = np.zeros(2 * size, dtype=np.float32)
+        self.end = size
+        
+    @property
+    def window(self):
+        """The newest size samples"""
+        return self.buffer[self.end - self.size:self.end]
+        
+    def next_hop(self):
+        """Slot for the next hop of samples; call advance() once it is filled"""
+        if self.end + self.hop > len(self.buffer):
+            keep = self.size - self.hop
+            self.buffer[:keep] = self.buffer[self.end - keep:self.end]
+            self.end = keep
+        return self.buffer[self.end:self.end + self.hop]
+        
+    def advance(self):
+        """Slide the window forward over the hop just written"""
+        self.end += self.hop
+        
+    def reset(self):
+        """Slot for a whole new window (used to skip ahead when behind)"""
+        self.end = self.size
+        return self.buffer[:self.size]
+
+
+class OnsetDetector:
+    """Spectral-flux onset detection with a running tempo and beat-phase estimate
+    
+    Flux is the summed increase in magnitude between consecutive FFT frames.
+    Its mean and variance are tracked with exponential moving averages, so
+    each frame costs O(1) beyond the flux itself. An onset is a frame whose
+    flux exceeds the mean by threshold standard deviations. The beat period
+    follows the onset intervals, folded onto the current tempo.
+    """
+    def __init__(self, bin_count, frames_per_second, threshold=3.0, min_interval=0.3,
+                 averaging_time=1.5, min_bpm=60, max_bpm=200):
+        self.threshold = threshold
+        self.min_interval = min_interval  # Seconds between onsets
+        self.alpha = 1.0 - np.exp(-1.0 / (frames_per_second * averaging_time))
+        self.min_period = 60.0 / max_bpm
+        self.max_period = 60.0 / min_bpm
+        
+        # Magnitudes of the previous and current frame, and their difference
+        self.previous = np.zeros(bin_count)
+        self.current = np.zeros(bin_count)
+        self.rise = np.zeros(bin_count)
+        
+        self.flux = 0.0
+        self.frames = 0
+        self.warmup_frames = int(frames_per_second * averaging_time)
+        self.mean = 0.0
+        self.variance = 0.0
+        self.last_onset = -np.inf
+        self.beat_period = 0.5  # 120 BPM until onsets say otherwise
+        self.beat_time = 0.0    # Time of the beat the phase counts from
+        
+    def update(self, magnitudes, now):
+        """Feed one frame of FFT magnitudes at stream time now; returns True on an onset"""
+        np.copyto(self.current, magnitudes)
+        np.subtract(self.current, self.previous, out=self.rise)
+        np.maximum(self.rise, 0.0, out=self.rise)
+        self.previous, self.current = self.current, self.previous
+        flux = float(self.rise.sum())
+        self.flux = flux
+        
+        deviation = flux - self.mean
+        spread = np.sqrt(self.variance)
+        self.frames += 1
+        onset = (self.frames > self.warmup_frames and
+                 deviation > self.threshold * spread and
+                 now - self.last_onset >= self.min_interval)
+        
+        # Exponentially weighted mean and variance. Deviations are capped for
+        # the variance so onsets themselves don't raise the threshold much.
+        self.mean += self.alpha * deviation
+        if self.frames > 1:
+            deviation = min(deviation, 3.0 * spread)
+        self.variance = (1.0 - self.alpha) * (self.variance + self.alpha * deviation * deviation)
+        
+        if onset:
+            self._track_tempo(now - self.last_onset)
+            self.last_onset = now
+            self.beat_time = now
+        return onset
+        
+    def _track_tempo(self, interval):
+        """Nudge the beat period towards an onset interval, allowing for skipped beats"""
+        if interval > 4 * self.max_period:
+            return  # First onset, or after a long silence
+        beats = max(1, round(interval / self.beat_period))
+        period = interval / beats
+        if self.min_period <= period <= self.max_period:
+            self.beat_period += 0.2 * (period - self.beat_period)
+            
+    @property
+    def bpm(self):
+        return 60.0 / self.beat_period
+        
+    def beat_phase(self, now):
+        """Position within the current beat at stream time now (0 on the beat, rising to 1)"""
+        return ((now - self.beat_time) / self.beat_period) % 1.0
+
+
+class WavSource:
+    """Reads a PCM WAV file as float32 mono blocks (-1 to 1), averaging channels"""
+    FULL_SCALE = {1: 128.0, 2: 32768.0, 3: 8388608.0, 4: 2147483648.0}
+    
+    def __init__(self, path, block_size=65536):
+        self.path = path
+        self.block_size = block_size  # Frames per yielded block
+        with wave.open(path, 'rb') as wav:
+            self.sample_rate = wav.getframerate()
+            self.channels = wav.getnchannels()
+            self.sample_width = wav.getsampwidth()
+            self.frame_count = wav.getnframes()
+        if self.sample_width not in self.FULL_SCALE:
+            raise ValueError(f"Unsupported WAV sample width: {self.sample_width} bytes")
+            
+    @property
+    def duration(self):
+        """Length in seconds"""
+        return self.frame_count / self.sample_rate
+        
+    def __iter__(self):
+        with wave.open(self.path, 'rb') as wav:
+            while True:
+                data = wav.readframes(self.block_size)
+                if not data:
+                    break
+                yield self._decode(data)
+                
+    def _decode(self, data):
+        """Convert interleaved PCM bytes to float32 mono"""
+        if self.sample_width == 1:
+            # 8-bit WAV is unsigned
+            samples = np.frombuffer(data, dtype=np.uint8).astype(np.int32) - 128
+        elif self.sample_width == 3:
+            # 24-bit little-endian, sign-extended by hand
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+            samples -= (samples & 0x800000) << 1
+        else:
+            samples = np.frombuffer(data, dtype=f'<i{self.sample_width}')
+        mono = samples.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        mono /= np.float32(self.FULL_SCALE[self.sample_width])
+        return mono
+
+
+class SyntheticAudio:
+    """Seeded synthetic PCM: a kick pattern at a set BPM over a repeating sweep and noise
+    
+    generate() continues the signal from where the last call stopped, and
+    the noise is drawn from a seeded generator, so the same settings give
+    the same samples however the stream is split into blocks.
+    """
+    def __init__(self, sample_rate=44100, bpm=120, seed=0, kick_pattern="x...x...x...x...",
+                 kick_level=0.8, sweep_level=0.2, sweep_range=(40, 8000), sweep_time=4.0,
+                 noise_level=0.05):
+        self.sample_rate = sample_rate
+        self.bpm = bpm
+        self.rng = np.random.default_rng(seed)
+        self.position = 0  # Samples generated so far
+        
+        # Kick pattern: one character per 16th note, 'x' for a kick
+        self.kick_steps = np.array([step == 'x' for step in kick_pattern])
+        self.kick_level = kick_level
+        self.kick_length = 0.15  # Seconds
+        
+        self.sweep_level = sweep_level
+        self.sweep_range = sweep_range
+        self.sweep_time = sweep_time
+        self.noise_level = noise_level
+        
+    @property
+    def step_time(self):
+        """Seconds per pattern step (a 16th note)"""
+        return 15.0 / self.bpm
+        
+    def generate(self, count):
+        """Next count samples as float32 in [-1, 1]"""
+        t = (self.position + np.arange(count)) / self.sample_rate
+        self.position += count
+        
+        # Exponential sine sweep from low to high, restarting every sweep_time
+        low, high = self.sweep_range
+        rate = np.log(high / low) / self.sweep_time
+        phase = 2 * np.pi * low * np.expm1(rate * (t % self.sweep_time)) / rate
+        samples = self.sweep_level * np.sin(phase)
+        
+        # Kicks: a decaying sine whose pitch drops from 150 Hz to 50 Hz
+        step = np.floor(t / self.step_time)
+        since = t - step * self.step_time
+        active = self.kick_steps[step.astype(np.intp) % len(self.kick_steps)] & (since < self.kick_length)
+        kick_phase = 2 * np.pi * (50 * since + 2.5 * (1 - np.exp(-since * 40)))
+        samples += np.where(active, self.kick_level * np.exp(-since * 30) * np.sin(kick_phase), 0.0)
+        
+        samples += self.noise_level * self.rng.standard_normal(count)
+        return np.clip(samples, -1.0, 1.0).astype(np.float32)
+        
+    def blocks(self, seconds, block_size=4096):
+        """Yield seconds of audio in blocks of block_size samples"""
+        remaining = int(seconds * self.sample_rate)
+        while remaining > 0:
+            count = min(block_size, remaining)
+            remaining -= count
+            yield self.generate(count)
+            
+    @property
+    def expected_beats(self):
+        """Kick times so far, in seconds"""
+        steps = np.arange(int(np.ceil(self.position / self.sample_rate / self.step_time)))
+        return steps[self.kick_steps[steps % len(self.kick_steps)]] * self.step_time
+
+
+class AudioFeatures:
+    """One published audio analysis result
+    
+    AudioProcessor fills a new instance for every analysis and then
+    publishes it with a single reference assignment, so a reader that grabs
+    processor.features once sees bands, volume and beat from the same
+    analysis without locks or copies. A published instance is never
+    modified again, so readers can hold on to it for as long as they like.
+    """
+    def __init__(self, band_count):
+        self.sequence = 0          # Increments with every published analysis
+        self.capture_time = 0.0    # time.monotonic() when the newest samples arrived
+        self.analysis_time = 0.0   # time.monotonic() when this was published
+        self.stream_time = 0.0     # Seconds of audio analysed, end of the window
+        self.bands = np.zeros(band_count)  # Band levels (0-1), read-only
+        self.bands.flags.writeable = False
+        self.volume = 0.0
+        self.beat = False          # A beat was detected in this analysis hop
+        self.beat_count = 0        # Beats detected since start
+        self.beat_time = 0.0       # Stream time of the last beat
+        self.beat_period = 0.5     # Seconds per beat
+        
+    def beat_phase(self):
+        """Position within the current beat (0 on the beat, rising to 1)"""
+        now = self.stream_time + (time.monotonic() - self.analysis_time)
+        return ((now - self.beat_time) / self.beat_period) % 1.0
+
+
+class AudioProcessor:
+    def __init__(self, sample_rate=44100, chunk_size=1024, hop_size=None, live=True,
+                 band_count=16, band_spacing='log', band_overlap=0.0, profiler=None,
+                 on_beat=None):
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size  # STFT window length
+        self.hop_size = hop_size or chunk_size // 2  # New samples per analysis
         self.running = False
         
         # Audio data buffers
-        self.audio_buffer = deque(maxlen=sample_rate // 10)  # 100ms buffer
+        self.audio_buffer = SampleRingBuffer(max(sample_rate // 10, 2 * chunk_size))  # 100ms buffer
+        self.stft_window = SlidingWindow(chunk_size, self.hop_size)
+        self.skipped_hops = 0
+        self.analysis_stage = (profiler or Profiler()).stage('audio_analysis')
         self.fft_data = np.zeros(chunk_size // 2)
-        self.volume_history = deque(maxlen=30)  # 30 frame history
         
         # Frequency bands for visualization
-        self.freq_bands = self._create_frequency_bands()
-        self.band_values = np.zeros(len(self.freq_bands))
+        self.filterbank = Filterbank(sample_rate, chunk_size, band_count, band_spacing, band_overlap)
+        self.freq_bands = self.filterbank.freq_bands
+        self.band_analyzer = BandAnalyzer(sample_rate, chunk_size, self.filterbank)
         
-        # Beat detection
-        self.beat_threshold = 0.3
-        self.last_beat_time = 0
-        self.beat_detected = False
+        # The capture callback wakes the processing loop once a hop of new
+        # samples has arrived
+        self.samples_ready = threading.Condition()
+        self.capture_time = 0.0
         
-        # Initialize PyAudio
-        try:
-            self.audio = pyaudio.PyAudio()
-            self.stream = None
-        except:
-            print("Warning: PyAudio not available, using simulation mode")
-            self.audio = None
+        # Audio-to-feature latency of recent analyses, in seconds
+        self.latencies = np.zeros(1000)
+        self.latency_count = 0
+        
+        # Beat detection. Times are on the stream clock: seconds of audio
+        # analysed, as of the end of the current window.
+        self.onset_detector = OnsetDetector(chunk_size // 2, sample_rate / self.hop_size)
+        
+        # Latest published features (see AudioFeatures)
+        self.features = AudioFeatures(len(self.freq_bands))
+        self.feature_sink = None  # Optional object with write(features), e.g. SharedFeatures
+        self.beats_seen = 0       # beat_count as of the last is_beat_detected() call
+        self.on_beat = on_beat    # Called after publishing a beat, from the analysis thread
+        
+        # Signal analysed in simulation mode
+        self.synthetic_audio = SyntheticAudio(sample_rate)
+        
+        # Initialize PyAudio (offline analysis doesn't need a capture device)
+        self.pyaudio = None
+        self.audio = None
+        self.stream = None
+        if live:
+            try:
+                import pyaudio
+                self.pyaudio = pyaudio
+                self.audio = pyaudio.PyAudio()
+            except:
+                print("Warning: PyAudio not available, using simulation mode")
             
-    def _create_frequency_bands(self):
-        """Create logarithmic frequency bands for visualization"""
-        # Create 16 frequency bands from 20Hz to 20kHz
-        min_freq = 20
-        max_freq = min(20000, self.sample_rate // 2)
-        bands = np.logspace(np.log10(min_freq), np.log10(max_freq), 17)
-        return [(bands[i], bands[i+1]) for i in range(16)]
+    @property
+    def band_count(self):
+        """Number of frequency bands in get_frequency_bands()"""
+        return len(self.freq_bands)
     
     def _audio_callback(self, in_data, frame_count, time_info, status):
         """PyAudio callback function"""
-        audio_data = np.frombuffer(in_data, dtype=np.float32)
-        self.audio_buffer.extend(audio_data)
-        return (None, pyaudio.paContinue)
+        self._ingest(np.frombuffer(in_data, dtype=np.float32))
+        return (None, self.pyaudio.paContinue)
+    
+    def _ingest(self, samples):
+        """Store captured samples and wake the processing loop if a hop is ready"""
+        self.audio_buffer.write(samples)
+        self.capture_time = time.monotonic()
+        if self._hop_ready():
+            with self.samples_ready:
+                self.samples_ready.notify()
+    
+    def _hop_ready(self):
+        """True once a hop of new samples is buffered"""
+        return self.audio_buffer.available >= self.hop_size
+    
+    def _wait_for_hop(self, timeout=0.5):
+        """Block until a hop of unprocessed samples is buffered (or stop is requested)"""
+        with self.samples_ready:
+            return self.samples_ready.wait_for(
+                lambda: self._hop_ready() or not self.running,
+                timeout
+            )
+    
+    def _record_latency(self, capture_time):
+        """Record the delay from capturing the newest samples to features being ready"""
+        self.latencies[self.latency_count % len(self.latencies)] = time.monotonic() - capture_time
+        self.latency_count += 1
+    
+    def get_latency_stats(self):
+        """Audio-to-feature latency percentiles over recent analyses, in milliseconds"""
+        recent = self.latencies[:min(self.latency_count, len(self.latencies))]
+        if len(recent) == 0:
+            return {}
+        p50, p90, p99 = np.percentile(recent, [50, 90, 99]) * 1000
+        return {'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'max_ms': recent.max() * 1000}
     
     def start(self):
         """Start audio processing"""
@@ -279,20 +1585,22 @@ class AudioProcessor:
         
         try:
             self.stream = self.audio.open(
-                format=pyaudio.paFloat32,
+                format=self.pyaudio.paFloat32,
                 channels=1,
                 rate=self.sample_rate,
                 input=True,
-                frames_per_buffer=self.chunk_size,
+                frames_per_buffer=self.hop_size,
                 stream_callback=self._audio_callback
             )
             self.stream.start_stream()
             
-            # Processing loop
+            # Processing loop - runs whenever the callback delivers a hop
             while self.running:
-                if len(self.audio_buffer) >= self.chunk_size:
-                    self._process_audio()
-                time.sleep(0.01)  # 100Hz processing rate
+                if not self._wait_for_hop():
+                    continue
+                capture_time = self.capture_time
+                if self._analyze_pending():
+                    self._record_latency(capture_time)
                 
         except Exception as e:
             print(f"Audio error: {e}")
@@ -300,83 +1608,912 @@ class AudioProcessor:
             self.stop()
     
     def _simulate_audio(self):
-        """Simulate audio data for testing"""
+        """Feed synthetic audio through the real analysis path, paced like a live input"""
         self.running = True
-        t = 0
+        hop_time = self.hop_size / self.sample_rate
+        next_hop = time.monotonic()
         while self.running:
-            # Generate fake audio data with beat
-            beat_freq = 2.0  # 2 Hz beat
-            audio_sim = np.sin(2 * np.pi * 440 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * beat_freq * t))
-            
-            # Simulate frequency bands
-            for i in range(len(self.band_values)):
-                self.band_values[i] = abs(np.sin(t * (i + 1) * 0.5)) * 0.8
+            self._ingest(self.synthetic_audio.generate(self.hop_size))
+            capture_time = self.capture_time
+            if self._analyze_pending():
+                self._record_latency(capture_time)
             
-            # Simulate beat detection
-            self.beat_detected = np.sin(2 * np.pi * beat_freq * t) > 0.8
-            
-            t += 0.02  # 50Hz simulation rate
-            time.sleep(0.02)
+            # Sleep until the next hop would have been captured
+            next_hop += hop_time
+            delay = next_hop - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_hop = time.monotonic()  # Fell behind, don't catch up in a burst
+    
+    def _analyze_pending(self):
+        """Run one analysis per buffered hop, skipping ahead if more than a window behind"""
+        analyzed = False
+        backlog = self.audio_buffer.available
+        if backlog > self.chunk_size:
+            self.skipped_hops += backlog // self.hop_size
+            if self.audio_buffer.latest(self.chunk_size, self.stft_window.reset()):
+                with self.analysis_stage:
+                    self._process_audio()
+                analyzed = True
+        
+        while self.audio_buffer.available >= self.hop_size:
+            self.audio_buffer.read(self.hop_size, self.stft_window.next_hop())
+            self.stft_window.advance()
+            with self.analysis_stage:
+                self._process_audio()
+            analyzed = True
+        return analyzed
+    
+    def analyze_blocks(self, blocks):
+        """Run the analysis over an iterable of sample blocks as fast as the CPU allows
+        
+        Yields the published AudioFeatures after every hop.
+        """
+        for block in blocks:
+            start = 0
+            while start < len(block):
+                # Top the ring buffer up to exactly one hop so no hop is skipped
+                end = start + self.hop_size - self.audio_buffer.available
+                self.audio_buffer.write(block[start:end])
+                start = end
+                if self._analyze_pending():
+                    yield self.features
     
     def _process_audio(self):
         """Process audio buffer and extract features"""
-        # Get latest audio chunk
-        audio_chunk = np.array(list(self.audio_buffer)[-self.chunk_size:])
+        # Current STFT window, filled from the ring buffer by the caller
+        audio_chunk = self.stft_window.window
         
         # Calculate volume (RMS)
-        volume = np.sqrt(np.mean(audio_chunk ** 2))
-        self.volume_history.append(volume)
+        volume = float(np.sqrt(np.dot(audio_chunk, audio_chunk) / len(audio_chunk)))
+        stream_time = self.audio_buffer.read_count / self.sample_rate
         
-        # FFT analysis
-        windowed = audio_chunk * np.hanning(len(audio_chunk))
-        fft = np.fft.fft(windowed)
-        self.fft_data = np.abs(fft[:len(fft)//2])
+        # FFT analysis and frequency bands
+        band_values = self.band_analyzer.analyze(audio_chunk)
+        self.fft_data = self.band_analyzer.magnitudes
         
-        # Extract frequency bands
-        freqs = np.fft.fftfreq(self.chunk_size, 1/self.sample_rate)[:self.chunk_size//2]
+        # Beat detection from spectral flux
+        beat_detected = self.onset_detector.update(self.fft_data, stream_time)
         
-        for i, (low_freq, high_freq) in enumerate(self.freq_bands):
-            band_mask = (freqs >= low_freq) & (freqs < high_freq)
-            self.band_values[i] = np.mean(self.fft_data[band_mask]) if np.any(band_mask) else 0
+        self._publish_features(band_values, volume, beat_detected, stream_time)
+    
+    def _publish_features(self, band_values, volume, beat, stream_time):
+        """Fill a new AudioFeatures and publish it with one reference assignment"""
+        features = AudioFeatures(len(band_values))
         
         # Normalize band values
-        max_val = np.max(self.band_values)
+        features.bands.flags.writeable = True
+        max_val = np.max(band_values)
         if max_val > 0:
-            self.band_values = self.band_values / max_val
+            np.divide(band_values, max_val, out=features.bands)
+        else:
+            np.copyto(features.bands, band_values)
+        features.bands.flags.writeable = False
         
-        # Beat detection
-        if len(self.volume_history) > 10:
-            recent_avg = np.mean(list(self.volume_history)[-10:])
-            historical_avg = np.mean(list(self.volume_history)[:-10])
-            
-            current_time = time.time()
-            if (recent_avg > historical_avg * (1 + self.beat_threshold) and 
-                current_time - self.last_beat_time > 0.3):  # Minimum 300ms between beats
-                self.beat_detected = True
-                self.last_beat_time = current_time
-            else:
-                self.beat_detected = False
+        features.volume = volume
+        features.beat = bool(beat)
+        features.beat_count = self.features.beat_count + features.beat
+        features.beat_time = self.onset_detector.beat_time
+        features.beat_period = self.onset_detector.beat_period
+        features.stream_time = stream_time
+        features.capture_time = self.capture_time
+        features.analysis_time = time.monotonic()
+        features.sequence = self.features.sequence + 1
+        self.features = features
+        if self.feature_sink:
+            self.feature_sink.write(features)
+        if features.beat and self.on_beat:
+            self.on_beat()
+    
+    def get_features(self):
+        """Get the latest published AudioFeatures (one consistent analysis)"""
+        return self.features
     
     def get_frequency_bands(self):
-        """Get current frequency band values (0-1)"""
-        return self.band_values.copy()
+        """Get current frequency band values (0-1, read-only)"""
+        return self.features.bands
     
     def get_volume(self):
         """Get current volume level (0-1)"""
-        return list(self.volume_history)[-1] if self.volume_history else 0
+        return self.features.volume
     
     def is_beat_detected(self):
-        """Check if beat was detected"""
-        return self.beat_detected
+        """Check if a beat was detected since the last call
+        
+        A beat only shows in features.beat for one analysis hop, which is
+        shorter than a frame, so render-loop callers go by the beat count.
+        """
+        beat_count = self.features.beat_count
+        detected = beat_count != self.beats_seen
+        self.beats_seen = beat_count
+        return detected
+    
+    def get_beat_phase(self):
+        """Position within the current beat (0 on the beat, rising to 1)"""
+        return self.features.beat_phase()
+    
+    def get_tempo(self):
+        """Estimated tempo in beats per minute"""
+        return self.onset_detector.bpm
+    
+    def get_buffer_stats(self):
+        """Get sample ring buffer overrun/underrun and skipped STFT hop counters"""
+        stats = self.audio_buffer.get_stats()
+        stats['skipped_hops'] = self.skipped_hops
+        return stats
     
     def stop(self):
         """Stop audio processing"""
         self.running = False
+        with self.samples_ready:
+            self.samples_ready.notify_all()
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
+            self.stream = None
         if self.audio:
             self.audio.terminate()
+            self.audio = None
+
+
+class SharedFeatures:
+    """AudioFeatures passed between processes through shared memory
+    
+    Layout: a header of two uint64 (sequence, band count) followed by
+    float64 fields and then the band levels. The writer makes the sequence
+    odd while it copies and even again when done; readers retry until they
+    see the same even sequence before and after their copy (a seqlock), so
+    neither side ever blocks the other.
+    """
+    HEADER_BYTES = 16
+    FIELDS = ('capture_time', 'analysis_time', 'stream_time', 'volume',
+              'beat', 'beat_count', 'beat_time', 'beat_period')
+    
+    def __init__(self, band_count, name=None, create=False):
+        from multiprocessing import shared_memory
+        size = self.HEADER_BYTES + 8 * (len(self.FIELDS) + band_count)
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self.owner = create
+        self.header = np.ndarray((2,), dtype=np.uint64, buffer=self.shm.buf)
+        self.values = np.ndarray(
+            (len(self.FIELDS) + band_count,), dtype=np.float64,
+            buffer=self.shm.buf, offset=self.HEADER_BYTES
+        )
+        self.fields = self.values[:len(self.FIELDS)]
+        self.bands = self.values[len(self.FIELDS):]
+        if create:
+            self.header[:] = (0, band_count)
+            
+    @property
+    def sequence(self):
+        return int(self.header[0])
+        
+    def write(self, features):
+        """Publish one AudioFeatures"""
+        sequence = int(self.header[0])
+        self.header[0] = sequence + 1  # Odd: write in progress
+        self.fields[:] = [getattr(features, field) for field in self.FIELDS]
+        self.bands[:] = features.bands
+        self.header[0] = sequence + 2
+        
+    def read(self, features, retries=100):
+        """Copy the latest published values into an AudioFeatures
+        
+        Returns the sequence read, or None if there was no consistent copy
+        within retries attempts. A writer that dies mid-copy leaves the
+        sequence odd for good, so readers must not wait for it forever.
+        """
+        features.bands.flags.writeable = True
+        for _ in range(retries):
+            sequence = int(self.header[0])
+            if sequence & 1:
+                time.sleep(0)  # Writer is mid-copy, let it finish
+                continue
+            fields = self.fields.tolist()
+            np.copyto(features.bands, self.bands)
+            if int(self.header[0]) == sequence:
+                break
+        else:
+            return None
+        features.bands.flags.writeable = False
+        
+        for field, value in zip(self.FIELDS, fields):
+            setattr(features, field, value)
+        features.beat = bool(features.beat)
+        features.beat_count = int(features.beat_count)
+        features.sequence = sequence // 2
+        return sequence
+        
+    def close(self):
+        self.header = self.values = self.fields = self.bands = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedStats:
+    """Profiler snapshots passed from the audio process through shared memory
+    
+    Layout: a header of two uint64 (sequence, length) followed by the
+    snapshot as UTF-8 JSON, guarded by the same seqlock as SharedFeatures.
+    The audio process writes a new snapshot every INTERVAL seconds.
+    """
+    HEADER_BYTES = 16
+    INTERVAL = 1.0
+    
+    def __init__(self, name=None, create=False, size=16384):
+        from multiprocessing import shared_memory
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self.owner = create
+        self.header = np.ndarray((2,), dtype=np.uint64, buffer=self.shm.buf)
+        self.data = np.ndarray(
+            (size - self.HEADER_BYTES if create else self.shm.size - self.HEADER_BYTES,),
+            dtype=np.uint8, buffer=self.shm.buf, offset=self.HEADER_BYTES
+        )
+        if create:
+            self.header[:] = 0
+            
+    def write(self, stats):
+        """Publish one stats dict"""
+        import json
+        data = json.dumps(stats, default=float).encode()
+        if len(data) > len(self.data):
+            data = json.dumps({'error': f"stats too large ({len(data)} bytes)"}).encode()
+        sequence = int(self.header[0])
+        self.header[0] = sequence + 1  # Odd: write in progress
+        self.data[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+        self.header[1] = len(data)
+        self.header[0] = sequence + 2
+        
+    def read(self, retries=100):
+        """Latest published stats dict, {} before the first, or None if the writer stalled"""
+        for _ in range(retries):
+            sequence = int(self.header[0])
+            if sequence & 1:
+                time.sleep(0)  # Writer is mid-copy, let it finish
+                continue
+            data = self.data[:int(self.header[1])].tobytes()
+            if int(self.header[0]) == sequence:
+                break
+        else:
+            return None
+        if not data:
+            return {}
+        import json
+        return json.loads(data)
+        
+    def close(self):
+        self.header = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _run_audio_process(name, stats_name, stop_connection, beat_connection, *args, **kwargs):
+    """Audio process entry point: analyse audio and publish features to shared memory"""
+    # Ctrl-C reaches the whole process group; the parent handles shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    profiler = Profiler()
+    processor = AudioProcessor(*args, profiler=profiler, **kwargs)
+    processor.feature_sink = SharedFeatures(len(processor.freq_bands), name=name)
+    
+    if beat_connection:
+        # One empty message per beat wakes the parent's beat watcher
+        def send_beat():
+            try:
+                beat_connection.send_bytes(b'')
+            except OSError:
+                pass  # Parent has gone
+        processor.on_beat = send_beat
+    
+    # Stage timings, latency and buffer stats for the parent's profiler
+    profiler.add_source('audio_latency', processor.get_latency_stats)
+    profiler.add_source('audio_buffer', processor.get_buffer_stats)
+    stats = SharedStats(name=stats_name)
+    stats_stopped = threading.Event()
+    
+    def publish_stats():
+        while not stats_stopped.wait(SharedStats.INTERVAL):
+            stats.write(profiler.snapshot())
+    stats_thread = threading.Thread(target=publish_stats, daemon=True)
+    stats_thread.start()
+    
+    def watch_stop():
+        # The parent stops us by closing its end of the pipe (or by exiting)
+        try:
+            stop_connection.recv()
+        except EOFError:
+            pass
+        processor.stop()
+    threading.Thread(target=watch_stop, daemon=True).start()
+    
+    try:
+        processor.start()
+    finally:
+        processor.stop()
+        stats_stopped.set()
+        stats_thread.join()
+        processor.feature_sink.close()
+        stats.close()
+
+
+class AudioProcess:
+    """AudioProcessor running in a child process, read through shared memory
+    
+    Offers the same reader API as AudioProcessor so patterns don't need to
+    know which one they have. Capture and FFT work happen on another core
+    with their own GIL; the render process only copies a few hundred bytes
+    when a new analysis has been published.
+    """
+    def __init__(self, sample_rate=44100, chunk_size=1024, hop_size=None,
+                 band_count=16, band_spacing='log', band_overlap=0.0, on_beat=None):
+        self.sample_rate = sample_rate
+        self.freq_bands = Filterbank(
+            sample_rate, chunk_size, band_count, band_spacing, band_overlap
+        ).freq_bands
+        self.shared = SharedFeatures(len(self.freq_bands), create=True)
+        self.shared_stats = SharedStats(create=True)
+        self.stats = {}  # Latest profiler snapshot from the audio process
+        
+        # Local copy of the latest shared features, replaced (never
+        # modified) when a newer one is read
+        self.features = AudioFeatures(len(self.freq_bands))
+        self.read_sequence = 0
+        self.beats_seen = 0  # beat_count as of the last is_beat_detected() call
+        
+        # Spawn rather than fork so the child starts clean, without the
+        # parent's LED output, GPIO state or signal handlers
+        import multiprocessing
+        context = multiprocessing.get_context('spawn')
+        
+        # Stop signal: closing the write end can't block, even if the child
+        # has already exited (an Event's set() can, on a dead sleeper)
+        self.stop_reader, self.stop_writer = context.Pipe(duplex=False)
+        
+        # Beats come back over a pipe, so on_beat runs on a thread here
+        self.on_beat = on_beat
+        self.beat_reader = self.beat_writer = None
+        if on_beat:
+            self.beat_reader, self.beat_writer = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_run_audio_process,
+            args=(self.shared.name, self.shared_stats.name, self.stop_reader, self.beat_writer,
+                  sample_rate, chunk_size, hop_size),
+            kwargs={
+                'band_count': band_count,
+                'band_spacing': band_spacing,
+                'band_overlap': band_overlap
+            },
+            name='audio',
+            daemon=True
+        )
+        
+    @property
+    def band_count(self):
+        """Number of frequency bands in get_frequency_bands()"""
+        return len(self.freq_bands)
+        
+    def start(self):
+        """Start the audio process (returns immediately)"""
+        self.process.start()
+        self.stop_reader.close()  # The child has its own copy
+        if self.beat_writer:
+            self.beat_writer.close()
+            threading.Thread(target=self._watch_beats, name='audio-beats', daemon=True).start()
+        
+    def _watch_beats(self):
+        """Call on_beat for every beat the audio process reports, until it exits"""
+        while True:
+            try:
+                self.beat_reader.recv_bytes()
+            except (EOFError, OSError):
+                break
+            self.on_beat()
+        self.beat_reader.close()
+        
+    def get_features(self):
+        """Get the latest AudioFeatures published by the audio process"""
+        if self.shared and self.shared.sequence != self.read_sequence:
+            features = AudioFeatures(len(self.freq_bands))
+            sequence = self.shared.read(features)
+            if sequence is None:
+                # Writer stalled mid-copy (or died there): keep the last
+                # features and only retry once the sequence moves again
+                self.read_sequence = self.shared.sequence
+            else:
+                self.read_sequence = sequence
+                self.features = features
+        return self.features
+        
+    def get_frequency_bands(self):
+        """Get current frequency band values (0-1, read-only)"""
+        return self.get_features().bands
+    
+    def get_volume(self):
+        """Get current volume level (0-1)"""
+        return self.get_features().volume
+    
+    def is_beat_detected(self):
+        """Check if a beat was detected since the last call"""
+        beat_count = self.get_features().beat_count
+        detected = beat_count != self.beats_seen
+        self.beats_seen = beat_count
+        return detected
+    
+    def get_beat_phase(self):
+        """Position within the current beat (0 on the beat, rising to 1)"""
+        return self.get_features().beat_phase()
+    
+    def get_tempo(self):
+        """Estimated tempo in beats per minute"""
+        return 60.0 / self.get_features().beat_period
+        
+    def get_process_stats(self):
+        """Latest profiler snapshot published by the audio process (see SharedStats)"""
+        if self.shared_stats:
+            stats = self.shared_stats.read()
+            if stats is not None:
+                self.stats = stats
+        return self.stats
+    
+    def get_stage_stats(self):
+        """Stage timings (audio_analysis) from the audio process"""
+        return self.get_process_stats().get('stages', {})
+    
+    def get_latency_stats(self):
+        """Audio-to-feature latency percentiles from the audio process, in milliseconds"""
+        return self.get_process_stats().get('audio_latency', {})
+    
+    def get_buffer_stats(self):
+        """Sample ring buffer and skipped hop counters from the audio process"""
+        return self.get_process_stats().get('audio_buffer', {})
+        
+    def stop(self, timeout=2.0):
+        """Stop the audio process and release the shared memory"""
+        self.stop_writer.close()
+        self.stop_reader.close()
+        if self.process.pid is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                print("Warning: audio process did not stop, terminating it")
+                self.process.terminate()
+                self.process.join()
+        if self.shared:
+            self.shared.close()
+            self.shared = None
+            self.shared_stats.close()
+            self.shared_stats = None
+
+
+def analyze_wav(path, output_path=None, chunk_size=2048, hop_size=256, **band_options):
+    """Analyse a WAV file offline and return its feature timeline
+    
+    The timeline has one row per STFT hop: stream time, band levels,
+    volume, beat flag and tempo. If output_path is given it is also saved
+    as a compressed .npz for comparing runs. band_options (band_count,
+    band_spacing, band_overlap) are passed on to AudioProcessor.
+    """
+    source = WavSource(path)
+    processor = AudioProcessor(source.sample_rate, chunk_size, hop_size, live=False, **band_options)
+    count = source.frame_count // processor.hop_size
+    timeline = {
+        'time': np.zeros(count, dtype=np.float32),
+        'bands': np.zeros((count, len(processor.freq_bands)), dtype=np.float32),
+        'volume': np.zeros(count, dtype=np.float32),
+        'beat': np.zeros(count, dtype=bool),
+        'bpm': np.zeros(count, dtype=np.float32)
+    }
+    
+    for i, features in enumerate(processor.analyze_blocks(source)):
+        timeline['time'][i] = features.stream_time
+        timeline['bands'][i] = features.bands
+        timeline['volume'][i] = features.volume
+        timeline['beat'][i] = features.beat
+        timeline['bpm'][i] = 60.0 / features.beat_period
+        
+    if output_path:
+        np.savez_compressed(
+            output_path,
+            sample_rate=source.sample_rate,
+            chunk_size=processor.chunk_size,
+            hop_size=processor.hop_size,
+            **timeline
+        )
+    return timeline
+
+
+# frame_scheduler.py - Frame Timing
+import numpy as np
+import time
+
+class FrameScheduler:
+    """Paces the main loop to absolute frame deadlines
+    
+    Deadlines sit on a fixed grid (start + n / frame_rate), so frame cost
+    and sleep overshoot never accumulate as drift. A frame that finishes
+    after the next deadline starts the following frame straight away, and
+    any deadlines that passed entirely are dropped rather than rendered as
+    a burst of catch-up frames.
+    """
+    def __init__(self, frame_rate, history=240):
+        self.frame_time = 1.0 / frame_rate
+        self.next_deadline = 0.0
+        self.frame_start = 0.0
+        
+        self.frames = 0   # Frames completed
+        self.missed = 0   # Frames that finished after their deadline
+        self.dropped = 0  # Frame slots skipped to get back on the grid
+        
+        # Recent frame costs and start-to-start intervals, in seconds
+        self.work_times = np.zeros(history)
+        self.intervals = np.zeros(history)
+        
+    def start(self):
+        """Put the first deadline one frame from now"""
+        self.frame_start = self.next_deadline = time.monotonic()
+        self.frames = self.missed = self.dropped = 0
+        
+    def resync(self):
+        """Restart the deadline grid from now after the loop has idled"""
+        self.frame_start = self.next_deadline = time.monotonic()
+        
+    def wait(self):
+        """End the current frame: record its cost and sleep until the next deadline"""
+        now = time.monotonic()
+        slot = self.frames % len(self.work_times)
+        self.work_times[slot] = now - self.frame_start
+        
+        self.next_deadline += self.frame_time
+        late = now - self.next_deadline
+        if late > 0:
+            self.missed += 1
+            skipped = int(late // self.frame_time)
+            self.dropped += skipped
+            self.next_deadline += skipped * self.frame_time
+        else:
+            time.sleep(-late)
+            
+        start = time.monotonic()
+        self.intervals[slot] = start - self.frame_start
+        self.frame_start = start
+        self.frames += 1
+        
+    def get_stats(self):
+        """Achieved FPS, jitter and frame cost over recent frames, and miss counters"""
+        count = min(self.frames, len(self.intervals))
+        if count == 0:
+            return {}
+        intervals = self.intervals[:count]
+        work = self.work_times[:count]
+        return {
+            'fps': count / intervals.sum(),
+            'jitter_ms': np.abs(intervals - self.frame_time).mean() * 1000,
+            'work_ms': work.mean() * 1000,
+            'work_max_ms': work.max() * 1000,
+            'load': work.mean() / self.frame_time,
+            'frames': self.frames,
+            'missed': self.missed,
+            'dropped': self.dropped
+        }
+
+
+# profiler.py - Stage Timing and Metrics
+import numpy as np
+import threading
+import time
+
+class Stage:
+    """Timer for one instrumented stage: running totals plus a window of recent durations
+    
+    Use as a context manager around the stage. Each Stage is timed from a
+    single thread; recording is a couple of stores, so it stays on all the
+    time.
+    """
+    def __init__(self, window=512):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = np.zeros(window)  # Seconds, ring of the latest durations
+        self.started = 0.0
+        
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+        
+    def __exit__(self, *exc_info):
+        self.record(time.perf_counter() - self.started)
+        
+    def record(self, duration):
+        self.recent[self.count % len(self.recent)] = duration
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+            
+    def summary(self, edges_ms):
+        """Totals, recent percentiles and a histogram of recent durations, in milliseconds"""
+        recent = self.recent[:min(self.count, len(self.recent))] * 1000
+        if len(recent) == 0:
+            return {'count': 0}
+        p50, p90, p99 = np.percentile(recent, [50, 90, 99])
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'max_ms': self.max * 1000,
+            'mean_ms': float(recent.mean()),
+            'p50_ms': p50,
+            'p90_ms': p90,
+            'p99_ms': p99,
+            'histogram': np.histogram(recent, edges_ms)[0].tolist()
+        }
+
+
+class Profiler:
+    """Per-stage and per-pattern timers, counters and stats sources, served as JSON
+    
+    snapshot() gathers everything into one dict. serve() exposes it over
+    HTTP on localhost (GET / returns the JSON) and start_logging() prints
+    a one-line summary every few seconds.
+    """
+    HISTOGRAM_EDGES_MS = [0, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, np.inf]
+    
+    def __init__(self, window=512):
+        self.window = window
+        self.groups = {'stages': {}, 'patterns': {}}
+        self.counters = {}
+        self.sources = {}  # name -> callable returning a stats dict
+        self.started = time.monotonic()
+        
+        self.server = None
+        self.stop_logging = threading.Event()
+        
+    def stage(self, name, group='stages'):
+        """Stage timer for name, created on first use"""
+        stages = self.groups[group]
+        stage = stages.get(name)
+        if stage is None:
+            stage = stages[name] = Stage(self.window)
+        return stage
+        
+    def count(self, name, amount=1):
+        """Add to a named counter"""
+        self.counters[name] = self.counters.get(name, 0) + amount
+        
+    def add_source(self, name, get_stats):
+        """Include another component's get_*_stats() in every snapshot"""
+        self.sources[name] = get_stats
+        
+    def snapshot(self):
+        """All timers, counters and sources as plain data"""
+        edges = self.HISTOGRAM_EDGES_MS
+        snapshot = {
+            'uptime': time.monotonic() - self.started,
+            'histogram_edges_ms': [float(edge) for edge in edges],
+            'counters': dict(self.counters)
+        }
+        for group, stages in self.groups.items():
+            snapshot[group] = {name: stage.summary(edges) for name, stage in list(stages.items())}
+        for name, get_stats in self.sources.items():
+            try:
+                snapshot[name] = get_stats()
+            except Exception as e:
+                snapshot[name] = {'error': str(e)}
+        return snapshot
+        
+    def summary_line(self):
+        """Mean and p99 of every stage, plus the counters, on one line"""
+        parts = []
+        for stages in self.groups.values():
+            for name, stage in list(stages.items()):
+                summary = stage.summary(self.HISTOGRAM_EDGES_MS)
+                if summary['count']:
+                    parts.append(f"{name} {summary['mean_ms']:.2f}/{summary['p99_ms']:.2f} ms")
+        parts.extend(f"{name}={value}" for name, value in self.counters.items())
+        return "Profile: " + " | ".join(parts)
+        
+    def serve(self, port, host='127.0.0.1'):
+        """Serve snapshot() as JSON over HTTP from a background thread"""
+        import json
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        profiler = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(profiler.snapshot(), default=float).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                
+            def log_message(self, format, *args):
+                pass  # Keep request lines out of the console
+                
+        try:
+            self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            print(f"Warning: metrics endpoint not available ({e})")
+            return
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True).start()
+        
+    def start_logging(self, interval):
+        """Print summary_line() every interval seconds"""
+        def log_loop():
+            while not self.stop_logging.wait(interval):
+                print(self.summary_line())
+        threading.Thread(target=log_loop, name='profile-log', daemon=True).start()
+        
+    def close(self):
+        self.stop_logging.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+# hardware_controls.py - Rotary Encoder and Button Input
+import threading
+import time
+from collections import deque
+
+# Rotary encoder quadrature decoding: index (previous AB << 2) | new AB,
+# value the step (+1 clockwise, -1 counter-clockwise, 0 for no move or a
+# skipped state)
+QUADRATURE_STEPS = [0, 1, -1, 0, -1, 0, 0, 1, 1, 0, 0, -1, 0, -1, 1, 0]
+
+
+class GPIOInputBackend:
+    """RPi.GPIO inputs with pull-ups and edge callbacks on both edges"""
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        self.pins = []
+        GPIO.setmode(GPIO.BCM)
+        
+    def setup_input(self, pin, callback):
+        """Call callback(pin) from the GPIO thread on every edge of pin"""
+        self.GPIO.setup(pin, self.GPIO.IN, pull_up_down=self.GPIO.PUD_UP)
+        self.GPIO.add_event_detect(pin, self.GPIO.BOTH, callback=callback)
+        self.pins.append(pin)
+        
+    def read(self, pin):
+        return self.GPIO.input(pin)
+        
+    def close(self):
+        self.GPIO.cleanup(self.pins)
+
+
+class MockInputBackend:
+    """Stand-in for GPIO: scripted pin changes fire the same edge callbacks"""
+    def __init__(self):
+        self.levels = {}
+        self.callbacks = {}
+        
+    def setup_input(self, pin, callback):
+        self.levels[pin] = 1  # Pulled up
+        self.callbacks[pin] = callback
+        
+    def read(self, pin):
+        return self.levels[pin]
+        
+    def set_level(self, pin, level):
+        """Drive a pin, firing its callback if the level changes"""
+        if self.levels[pin] != level:
+            self.levels[pin] = level
+            self.callbacks[pin](pin)
+            
+    def turn(self, pin_a, pin_b, detents):
+        """Full quadrature cycles on an encoder, clockwise for positive detents"""
+        sequence = [(1, 0), (0, 0), (0, 1), (1, 1)]
+        if detents < 0:
+            sequence = [(0, 1), (0, 0), (1, 0), (1, 1)]
+        for _ in range(abs(detents)):
+            for level_a, level_b in sequence:
+                self.set_level(pin_a, level_a)
+                self.set_level(pin_b, level_b)
+                
+    def press(self, pin):
+        """Press and release an (active low) button"""
+        self.set_level(pin, 0)
+        self.set_level(pin, 1)
+        
+    def play(self, script):
+        """Run (delay, method name, args) steps on a background thread"""
+        def run():
+            for delay, action, args in script:
+                time.sleep(delay)
+                getattr(self, action)(*args)
+        thread = threading.Thread(target=run, name='mock-input', daemon=True)
+        thread.start()
+        return thread
+        
+    def close(self):
+        pass
+
+
+class ControlsManager:
+    """Rotary encoder and buttons decoded in edge callbacks into an event queue
+    
+    Callbacks run on the GPIO thread: encoder edges go through the
+    quadrature table and emit a ('rotary', +1/-1, time) event per detent;
+    button presses emit (name, 1, time). Events go into a deque, whose
+    append and popleft are atomic, so the main loop drains them in batches
+    without locking. on_event is called after each event, e.g. to wake an
+    idle main loop.
+    """
+    def __init__(self, rotary_pins=(2, 3, 4), button_pins=(17, 27), backend=None,
+                 on_event=None, steps_per_detent=4, debounce=0.02, queue_size=256):
+        if backend is None:
+            try:
+                backend = GPIOInputBackend()
+            except:
+                print("Warning: GPIO not available, using mock controls")
+                backend = MockInputBackend()
+        self.backend = backend
+        self.on_event = on_event
+        self.events = deque(maxlen=queue_size)
+        self.dropped = 0  # Events lost because the queue was full
+        
+        # Encoder state
+        self.pin_a, self.pin_b, rotary_button = rotary_pins
+        self.steps_per_detent = steps_per_detent
+        self.rotary_steps = 0
+        
+        # Buttons: (pin, event name), pressed on the falling edge
+        self.debounce = debounce
+        self.buttons = {
+            rotary_button: 'rotary_button',
+            button_pins[0]: 'button1',
+            button_pins[1]: 'button2'
+        }
+        self.last_press = {pin: 0.0 for pin in self.buttons}
+        
+        backend.setup_input(self.pin_a, self._rotary_edge)
+        backend.setup_input(self.pin_b, self._rotary_edge)
+        self.rotary_state = (backend.read(self.pin_a) << 1) | backend.read(self.pin_b)
+        for pin in self.buttons:
+            backend.setup_input(pin, self._button_edge)
+            
+    def _push(self, kind, value):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append((kind, value, time.monotonic()))
+        if self.on_event:
+            self.on_event()
+            
+    def _rotary_edge(self, pin):
+        """Decode one encoder edge; a full detent emits a rotary event"""
+        state = (self.backend.read(self.pin_a) << 1) | self.backend.read(self.pin_b)
+        self.rotary_steps += QUADRATURE_STEPS[(self.rotary_state << 2) | state]
+        self.rotary_state = state
+        if abs(self.rotary_steps) >= self.steps_per_detent:
+            direction = 1 if self.rotary_steps > 0 else -1
+            self.rotary_steps -= direction * self.steps_per_detent
+            self._push('rotary', direction)
+            
+    def _button_edge(self, pin):
+        """Emit a press on the falling edge, ignoring bounces"""
+        if self.backend.read(pin):
+            return
+        now = time.monotonic()
+        if now - self.last_press[pin] >= self.debounce:
+            self.last_press[pin] = now
+            self._push(self.buttons[pin], 1)
+            
+    def drain(self, max_events=64):
+        """Take up to max_events queued events, oldest first"""
+        batch = []
+        while self.events and len(batch) < max_events:
+            batch.append(self.events.popleft())
+        return batch
+        
+    def close(self):
+        self.backend.close()
 
 
 # config.py - Configuration Settings
@@ -386,12 +2523,44 @@ class Config:
     MATRIX_HEIGHT = 16
     LED_PIN = 18
     
+    # Tiled walls: one (x, y, channel, rotation, flip_x, flip_y) entry per
+    # tile in chain order, x/y being the tile's top-left pixel. Channel n is
+    # driven from OUTPUT_PINS[n]. None drives a single MATRIX_WIDTH x
+    # MATRIX_HEIGHT strip on LED_PIN.
+    # Up to two channels: channel 0 on a PWM0 pin (12 or 18) and channel 1
+    # on a PWM1 pin (13 or 19), both driven by one rpi_ws281x controller.
+    TILE_LAYOUT = None
+    TILE_SIZE = (16, 16)
+    OUTPUT_PINS = [18, 13]
+    
+    # Where frames go: 'neopixel' (the strip or tiled wall), 'null'
+    # (discard), 'shm' or 'shm:<name>' (SharedMemoryOutput ring for local
+    # viewers), or 'rawvideo:<path>' (raw rgb24 file). The last three run
+    # the full loop headless, e.g. for soak tests.
+    OUTPUT_BACKEND = 'neopixel'
+    
     # Audio Configuration
     SAMPLE_RATE = 44100
-    CHUNK_SIZE = 1024
+    CHUNK_SIZE = 2048  # STFT window
+    HOP_SIZE = 256     # New samples between analyses (~170 per second)
+    AUDIO_PROCESS = False  # Capture and analyse in a child process (multi-core boards)
+    BAND_COUNT = 16        # Frequency bands (32 or 64 for bigger panels)
+    BAND_SPACING = 'log'   # 'log', 'mel' or 'bark'
+    BAND_OVERLAP = 0.0     # 0 = separate bands, 1 = triangular filters to neighbouring centres
     
     # Display Configuration
     FRAME_RATE = 60
+    # Transmit to the LEDs from a thread while the next frame renders. This
+    # only helps if the strip driver releases the GIL while transmitting
+    # (bench_pipelined_output shows both cases); enable it once measured on
+    # the device, as it also lowers the process-wide GIL switch interval.
+    PIPELINED_OUTPUT = False
+    SWITCH_INTERVAL = 0.001  # Seconds between GIL hand-offs when pipelined
+    
+    # Profiling: JSON metrics on http://127.0.0.1:PROFILER_PORT/ (None to
+    # disable) and a summary line every PROFILER_LOG_INTERVAL seconds (0 = off)
+    PROFILER_PORT = 8321
+    PROFILER_LOG_INTERVAL = 0
     DEFAULT_BRIGHTNESS = 0.5
     
     # Control Configuration
@@ -409,4 +2578,6 @@ class Config:
     # Pattern Configuration
     PATTERN_MODES = ['AUDIO', 'AMBIENT', 'GAMES']
     AUDIO_PATTERNS = ['spectrum', 'waveform', 'circles', 'bars']
-    AMBIENT_PATTERNS = ['clock', 'weather', 'matrix_rain', 'fire']
\ No newline at end of file
+    AMBIENT_PATTERNS = ['clock', 'matrix_rain', 'fire', 'plasma']
+    GAME_PATTERNS = ['snake', 'life', 'tetris']
+    PATTERN_EVICT_TIME = None  # Seconds unused before a pattern is freed (None = keep)
\ No newline at end of file
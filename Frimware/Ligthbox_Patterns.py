@@ -1,88 +1,132 @@
 # pattern_manager.py - Pattern Management System
 import time
-import math
 import random
 import numpy as np
 from config import Config
+from led_controller import hsv_to_rgb
+from profiler import Profiler
 
 class PatternManager:
-    def __init__(self, led_matrix, audio_processor):
+    def __init__(self, led_matrix, audio_processor, profiler=None):
         self.led_matrix = led_matrix
         self.audio_processor = audio_processor
         self.config = Config()
         
+        # Per-pattern update timers and pattern switch timing
+        self.profiler = profiler or Profiler()
+        self.switch_stage = self.profiler.stage('pattern_switch')
+        
         # Current state
         self.current_mode = 0  # 0=AUDIO, 1=AMBIENT, 2=GAMES
         self.current_pattern = 0
         self.pattern_start_time = time.time()
+        self.redraw = True  # Render on the next frame whatever the pattern says
         
-        # Pattern instances
-        self.audio_patterns = [
-            SpectrumAnalyzer(led_matrix, audio_processor),
-            WaveformPattern(led_matrix, audio_processor),
-            PulsingCircles(led_matrix, audio_processor),
-            FrequencyBars(led_matrix, audio_processor)
-        ]
-        
-        self.ambient_patterns = [
-            DigitalClock(led_matrix),
-            MatrixRain(led_matrix),
-            FireEffect(led_matrix),
-            PlasmaEffect(led_matrix)
-        ]
-        
-        self.games = [
-            Snake(led_matrix),
-            ConwayLife(led_matrix),
-            Tetris(led_matrix)
-        ]
-        
+        # Pattern names per mode (see PATTERN_REGISTRY). Patterns are built
+        # the first time they are selected and, if PATTERN_EVICT_TIME is
+        # set, dropped again once they have been unused that long.
         self.pattern_collections = [
-            self.audio_patterns,
-            self.ambient_patterns,
-            self.games
+            self.config.AUDIO_PATTERNS,
+            self.config.AMBIENT_PATTERNS,
+            self.config.GAME_PATTERNS
         ]
+        self.patterns = {}   # name -> instance
+        self.last_used = {}  # name -> time.monotonic() it was last used
+        self.evict_after = self.config.PATTERN_EVICT_TIME
+    
+    def get_pattern(self, name):
+        """Pattern instance for a registry name, built on first use"""
+        pattern = self.patterns.get(name)
+        if pattern is None:
+            pattern_class = PATTERN_REGISTRY[name]
+            if pattern_class.uses_audio:
+                pattern = pattern_class(self.led_matrix, self.audio_processor)
+            else:
+                pattern = pattern_class(self.led_matrix)
+            self.patterns[name] = pattern
+        self.last_used[name] = time.monotonic()
+        return pattern
+    
+    def current_pattern_name(self):
+        names = self.pattern_collections[self.current_mode]
+        return names[self.current_pattern] if names else None
+    
+    def get_current_pattern(self):
+        """The selected pattern instance, or None if the mode has no patterns"""
+        name = self.current_pattern_name()
+        return self.get_pattern(name) if name else None
+    
+    def _selected(self):
+        """Build the newly selected pattern and evict ones unused for too long"""
+        self.pattern_start_time = time.time()
+        self.redraw = True
+        self.get_current_pattern()
+        if not self.evict_after:
+            return
+        now = time.monotonic()
+        current = self.current_pattern_name()
+        for name, last_used in list(self.last_used.items()):
+            if name != current and now - last_used > self.evict_after:
+                del self.patterns[name]
+                del self.last_used[name]
     
     def next_pattern(self):
         """Switch to next pattern in current mode"""
-        current_collection = self.pattern_collections[self.current_mode]
-        self.current_pattern = (self.current_pattern + 1) % len(current_collection)
-        self.pattern_start_time = time.time()
+        with self.switch_stage:
+            current_collection = self.pattern_collections[self.current_mode]
+            self.current_pattern = (self.current_pattern + 1) % len(current_collection)
+            self._selected()
         print(f"Switched to pattern {self.current_pattern} in mode {self.current_mode}")
     
     def previous_pattern(self):
         """Switch to previous pattern in current mode"""
-        current_collection = self.pattern_collections[self.current_mode]
-        self.current_pattern = (self.current_pattern - 1) % len(current_collection)
-        self.pattern_start_time = time.time()
+        with self.switch_stage:
+            current_collection = self.pattern_collections[self.current_mode]
+            self.current_pattern = (self.current_pattern - 1) % len(current_collection)
+            self._selected()
         print(f"Switched to pattern {self.current_pattern} in mode {self.current_mode}")
     
     def next_mode(self):
         """Switch to next mode (Audio/Ambient/Games)"""
-        self.current_mode = (self.current_mode + 1) % len(self.pattern_collections)
-        self.current_pattern = 0
-        self.pattern_start_time = time.time()
-        mode_names = ['AUDIO', 'AMBIENT', 'GAMES']
+        with self.switch_stage:
+            self.current_mode = (self.current_mode + 1) % len(self.pattern_collections)
+            self.current_pattern = 0
+            self._selected()
+        mode_names = self.config.PATTERN_MODES
         print(f"Switched to mode: {mode_names[self.current_mode]}")
     
     def update(self):
         """Update current pattern"""
-        current_collection = self.pattern_collections[self.current_mode]
-        if current_collection:
-            pattern = current_collection[self.current_pattern]
-            pattern.update()
+        self.redraw = False
+        pattern = self.get_current_pattern()
+        if pattern:
+            with self.profiler.stage(type(pattern).__name__, 'patterns'):
+                pattern.update()
+    
+    def next_change(self):
+        """When the current pattern next needs an update (see BasePattern.next_change)"""
+        pattern = self.get_current_pattern()
+        if self.redraw or not pattern:
+            return BasePattern.EVERY_FRAME
+        return pattern.next_change()
     
     def toggle_settings(self):
         """Toggle pattern-specific settings"""
-        current_collection = self.pattern_collections[self.current_mode]
-        if current_collection:
-            pattern = current_collection[self.current_pattern]
-            if hasattr(pattern, 'toggle_settings'):
-                pattern.toggle_settings()
+        pattern = self.get_current_pattern()
+        if hasattr(pattern, 'toggle_settings'):
+            pattern.toggle_settings()
+            self.redraw = True
 
 
 # Base Pattern Class
 class BasePattern:
+    uses_audio = False  # Constructed with (led_matrix, audio_processor) when True
+    
+    # next_change() results
+    EVERY_FRAME = 0.0      # Render every frame
+    UNTIL_INPUT = None     # Static until a control input
+    UNTIL_AUDIO = 'audio'  # Static until a beat (or a control input)
+    
     def __init__(self, led_matrix):
         self.led_matrix = led_matrix
         self.start_time = time.time()
@@ -94,15 +138,37 @@ class BasePattern:
     def update(self):
         """Override in subclasses"""
         pass
+    
+    def next_change(self):
+        """When this pattern next needs an update
+        
+        EVERY_FRAME, a time.time() value before which nothing changes,
+        UNTIL_INPUT or UNTIL_AUDIO. Override in patterns that are static
+        for a while.
+        """
+        return self.EVERY_FRAME
 
 
 # Audio-Reactive Patterns
 class SpectrumAnalyzer(BasePattern):
+    uses_audio = True
+    
     def __init__(self, led_matrix, audio_processor):
         super().__init__(led_matrix)
         self.audio_processor = audio_processor
         self.smoothing_factor = 0.7
-        self.prev_bands = np.zeros(16)
+        self.prev_bands = np.zeros(audio_processor.band_count)
+        
+        # Bar level of each row (0 = bottom row) and rainbow hue of each column
+        width, height = led_matrix.width, led_matrix.height
+        self.levels = np.arange(height - 1, -1, -1)[:, None]
+        self.hues = np.arange(width)[None, :] / width
+        
+        # Bands shown in each column: averaged when there are more bands
+        # than columns, repeated when there are fewer
+        band_count = audio_processor.band_count
+        self.column_starts = np.arange(width) * band_count // width
+        self.column_sizes = np.maximum(np.diff(self.column_starts, append=band_count), 1)
         
     def update(self):
         self.led_matrix.clear()
@@ -114,56 +180,59 @@ class SpectrumAnalyzer(BasePattern):
         self.prev_bands = (self.smoothing_factor * self.prev_bands + 
                           (1 - self.smoothing_factor) * bands)
         
-        # Draw frequency bars
-        for i in range(16):
-            height = int(self.prev_bands[i] * 16)
-            hue = i / 16.0  # Rainbow colors across frequency spectrum
-            
-            for y in range(height):
-                # Color intensity based on height
-                saturation = 1.0
-                value = (y + 1) / 16.0
-                self.led_matrix.set_pixel_hsv(i, 15 - y, hue, saturation, value)
+        # Draw frequency bars, brighter towards the top of each bar
+        columns = np.add.reduceat(self.prev_bands, self.column_starts) / self.column_sizes
+        height = self.led_matrix.height
+        heights = (columns * height).astype(int)
+        self.led_matrix.fill_hsv(
+            self.hues, 1.0, (self.levels + 1) / height,
+            mask=self.levels < heights[None, :]
+        )
 
 
 class WaveformPattern(BasePattern):
+    uses_audio = True
+    
     def __init__(self, led_matrix, audio_processor):
         super().__init__(led_matrix)
         self.audio_processor = audio_processor
-        self.waveform_history = []
+        
+        # One column per volume sample, oldest on the left
+        width, height = led_matrix.width, led_matrix.height
+        self.waveform_history = np.zeros(width)
+        self.history_length = 0
+        
+        # Distance of each row from the centre and the color it gets there
+        self.center_y = height // 2
+        half = height / 2.0
+        self.distance = np.abs(np.arange(height) - self.center_y)[:, None]
+        intensity = np.maximum(0, 1.0 - self.distance / half)
+        self.row_colors = (intensity[..., None] * [255, 100, 255]).astype(np.uint8)
         
     def update(self):
         self.led_matrix.clear()
         
         # Get current volume and add to history
         volume = self.audio_processor.get_volume()
-        self.waveform_history.append(volume)
-        
-        # Keep only last 16 samples (width of matrix)
-        if len(self.waveform_history) > 16:
-            self.waveform_history.pop(0)
-        
-        # Draw waveform
-        for x in range(len(self.waveform_history)):
-            amplitude = self.waveform_history[x]
-            center_y = 8
-            wave_height = int(amplitude * 8)
-            
-            # Draw wave from center outward
-            for y in range(max(0, center_y - wave_height), 
-                          min(16, center_y + wave_height + 1)):
-                distance_from_center = abs(y - center_y)
-                intensity = max(0, 1.0 - distance_from_center / 8.0)
-                
-                color = (
-                    int(intensity * 255),
-                    int(intensity * 100),
-                    int(intensity * 255)
-                )
-                self.led_matrix.set_pixel(x, y, color)
+        if self.history_length < len(self.waveform_history):
+            self.waveform_history[self.history_length] = volume
+            self.history_length += 1
+        else:
+            self.waveform_history[:-1] = self.waveform_history[1:]
+            self.waveform_history[-1] = volume
+        
+        # Draw wave from center outward
+        columns = self.history_length
+        wave_heights = (self.waveform_history[:columns] * (self.led_matrix.height // 2)).astype(int)
+        mask = self.distance <= wave_heights[None, :]
+        target = self.led_matrix.buffer[:, :columns]
+        target[mask] = np.broadcast_to(self.row_colors, target.shape)[mask]
+        self.led_matrix.mark_dirty()
 
 
 class PulsingCircles(BasePattern):
+    uses_audio = True
+    
     def __init__(self, led_matrix, audio_processor):
         super().__init__(led_matrix)
         self.audio_processor = audio_processor
@@ -174,12 +243,15 @@ class PulsingCircles(BasePattern):
         
         # Create new circle on beat
         if self.audio_processor.is_beat_detected():
+            hue = random.random()
+            width, height = self.led_matrix.width, self.led_matrix.height
             self.circles.append({
-                'x': 8,
-                'y': 8,
+                'x': width // 2,
+                'y': height // 2,
                 'radius': 0,
-                'max_radius': 12,
-                'hue': random.random(),
+                'max_radius': max(width, height) * 0.75,
+                'hue': hue,
+                'color': hsv_to_rgb(hue, 1.0, 1.0),
                 'birth_time': time.time()
             })
         
@@ -195,45 +267,67 @@ class PulsingCircles(BasePattern):
             alpha = 1.0 - progress
             
             # Draw circle
-            for y in range(16):
-                for x in range(16):
-                    distance = math.sqrt((x - circle['x'])**2 + (y - circle['y'])**2)
-                    if abs(distance - circle['radius']) < 1.0:
-                        intensity = alpha * (1.0 - abs(distance - circle['radius']))
-                        self.led_matrix.set_pixel_hsv(
-                            x, y, 
-                            circle['hue'], 
-                            1.0, 
-                            intensity
-                        )
+            self.led_matrix.draw_ring(
+                circle['x'], circle['y'], circle['radius'], circle['color'], alpha
+            )
+    
+    def next_change(self):
+        # Blank between beats once the last circle has faded
+        if not self.circles:
+            return self.UNTIL_AUDIO
+        return self.EVERY_FRAME
 
 
 class FrequencyBars(BasePattern):
+    uses_audio = True
+    
     def __init__(self, led_matrix, audio_processor):
         super().__init__(led_matrix)
         self.audio_processor = audio_processor
         
+        # Bar level of each row (0 = bottom row)
+        width, height = led_matrix.width, led_matrix.height
+        self.levels = np.arange(height - 1, -1, -1)[:, None]
+        
+        # Bars at least two columns wide; the last column of each bar is
+        # dimmer to fill the gap
+        band_count = audio_processor.band_count
+        self.bar_count = max(1, min(band_count, width // 2))
+        self.column_bars = np.arange(width) * self.bar_count // width
+        
+        # Bands averaged into each bar, so the bars cover the whole spectrum
+        self.bar_starts = np.arange(self.bar_count) * band_count // self.bar_count
+        self.bar_sizes = np.diff(self.bar_starts, append=band_count)
+        gaps = np.diff(self.column_bars, append=self.bar_count) > 0
+        self.values = np.where(gaps, 0.7, 1.0)[None, :]
+        
+        # Color from red (bottom) to blue (top)
+        self.hues = (1.0 - self.levels / height) * 0.8
+        
     def update(self):
         self.led_matrix.clear()
         
         bands = self.audio_processor.get_frequency_bands()
         
         # Draw as vertical bars with gaps
-        for i in range(0, 16, 2):  # Every other column
-            band_index = i // 2
-            if band_index < len(bands):
-                height = int(bands[band_index] * 16)
-                
-                for y in range(height):
-                    # Color from red (bottom) to blue (top)
-                    hue = (1.0 - y / 16.0) * 0.8  # Red to blue range
-                    self.led_matrix.set_pixel_hsv(i, 15 - y, hue, 1.0, 1.0)
-                    if i + 1 < 16:  # Fill the gap
-                        self.led_matrix.set_pixel_hsv(i + 1, 15 - y, hue, 1.0, 0.7)
+        bars = np.add.reduceat(bands, self.bar_starts) / self.bar_sizes
+        heights = (bars[self.column_bars] * self.led_matrix.height).astype(int)
+        
+        self.led_matrix.fill_hsv(
+            self.hues, 1.0, self.values,
+            mask=self.levels < heights[None, :]
+        )
 
 
 # Ambient Patterns
 class DigitalClock(BasePattern):
+    HUE_STEPS = 10  # Hue drift updates per second
+    
+    # Digit positions in the 16x16 layout, scaled up on larger panels
+    LAYOUT = ((0, 1), (1, 5), (None, 8), (3, 10), (4, 14))
+    LAYOUT_SIZE = 16
+    LAYOUT_TOP = 6
+    
     def __init__(self, led_matrix):
         super().__init__(led_matrix)
         self.digit_patterns = {
@@ -250,13 +344,28 @@ class DigitalClock(BasePattern):
             ':': [[0],[1],[0],[1],[0]]
         }
         
+        # Whole-pixel scale of the layout and offset to centre it
+        width, height = led_matrix.width, led_matrix.height
+        self.scale = max(1, min(width, height) // self.LAYOUT_SIZE)
+        self.offset_x = max(0, (width - self.LAYOUT_SIZE * self.scale) // 2)
+        self.offset_y = max(0, (height - self.LAYOUT_SIZE * self.scale) // 2)
+        
+        # Digit bitmaps as scaled boolean masks
+        block = np.ones((self.scale, self.scale), dtype=bool)
+        self.digit_masks = {
+            digit: np.kron(np.array(pattern, dtype=bool), block)
+            for digit, pattern in self.digit_patterns.items()
+        }
+        
     def draw_digit(self, digit, start_x, start_y, color):
-        if digit in self.digit_patterns:
-            pattern = self.digit_patterns[digit]
-            for y, row in enumerate(pattern):
-                for x, pixel in enumerate(row):
-                    if pixel and start_x + x < 16 and start_y + y < 16:
-                        self.led_matrix.set_pixel(start_x + x, start_y + y, color)
+        if digit in self.digit_masks:
+            mask = self.digit_masks[digit]
+            end_x = min(self.led_matrix.width, start_x + mask.shape[1])
+            end_y = min(self.led_matrix.height, start_y + mask.shape[0])
+            if start_x < end_x and start_y < end_y:
+                target = self.led_matrix.buffer[start_y:end_y, start_x:end_x]
+                target[mask[:end_y - start_y, :end_x - start_x]] = color
+                self.led_matrix.mark_dirty(start_y, end_y)
     
     def update(self):
         self.led_matrix.clear()
@@ -264,162 +373,211 @@ class DigitalClock(BasePattern):
         # Get current time
         current_time = time.strftime("%H:%M")
         
-        # Color cycles through rainbow
-        hue = (self.get_time() * 0.1) % 1.0
-        import colorsys
-        r, g, b = colorsys.hsv_to_rgb(hue, 1.0, 1.0)
-        color = (int(r * 255), int(g * 255), int(b * 255))
+        # Color cycles through rainbow, in HUE_STEPS steps per second
+        hue = (int(self.get_time() * self.HUE_STEPS) / self.HUE_STEPS * 0.1) % 1.0
+        color = tuple(hsv_to_rgb(hue, 1.0, 1.0))
         
         # Draw time centered
-        self.draw_digit(current_time[0], 1, 6, color)   # H
-        self.draw_digit(current_time[1], 5, 6, color)   # H
-        self.draw_digit(':', 8, 6, color)               # :
-        self.draw_digit(current_time[3], 10, 6, color)  # M
-        self.draw_digit(current_time[4], 14, 6, color)  # M
+        y = self.offset_y + self.LAYOUT_TOP * self.scale
+        for index, x in self.LAYOUT:
+            digit = ':' if index is None else current_time[index]
+            self.draw_digit(digit, self.offset_x + x * self.scale, y, color)
+    
+    def next_change(self):
+        # Next hue step or minute change, whichever comes first
+        next_step = self.start_time + (int(self.get_time() * self.HUE_STEPS) + 1) / self.HUE_STEPS
+        next_minute = (int(time.time() // 60) + 1) * 60
+        return min(next_step, next_minute)
 
 
 class MatrixRain(BasePattern):
+    FADE = 15  # Brightness lost per frame
+    
     def __init__(self, led_matrix):
         super().__init__(led_matrix)
-        self.drops = []
         self.characters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
         
+        # Drops as parallel arrays: column, row, rows per second, last step time
+        self.drop_x = np.zeros(0, dtype=int)
+        self.drop_y = np.zeros(0, dtype=int)
+        self.drop_speed = np.zeros(0)
+        self.drop_time = np.zeros(0)
+        
+        # A new drop chance per 16 columns each frame
+        self.spawn_chances = max(1, led_matrix.width // 16)
+        
     def update(self):
-        # Fade existing pixels
-        for y in range(16):
-            for x in range(16):
-                current = self.led_matrix.buffer[y, x]
-                faded = [max(0, c - 15) for c in current]
-                self.led_matrix.set_pixel(x, y, faded)
+        # Fade existing pixels, saturating at zero
+        buffer = self.led_matrix.buffer
+        np.subtract(buffer, np.minimum(buffer, self.FADE), out=buffer)
+        self.led_matrix.mark_dirty()
         
         # Add new drops randomly
-        if random.random() < 0.3:
-            self.drops.append({
-                'x': random.randint(0, 15),
-                'y': 0,
-                'speed': random.uniform(0.5, 2.0),
-                'last_update': time.time()
-            })
+        current_time = time.time()
+        count = np.count_nonzero(np.random.random(self.spawn_chances) < 0.3)
+        if count:
+            self.drop_x = np.append(self.drop_x, np.random.randint(0, self.led_matrix.width, count))
+            self.drop_y = np.append(self.drop_y, np.zeros(count, dtype=int))
+            self.drop_speed = np.append(self.drop_speed, np.random.uniform(0.5, 2.0, count))
+            self.drop_time = np.append(self.drop_time, np.full(count, current_time))
         
         # Update drops
-        current_time = time.time()
-        for drop in self.drops[:]:
-            if current_time - drop['last_update'] > 1.0 / drop['speed']:
-                drop['y'] += 1
-                drop['last_update'] = current_time
-                
-                if drop['y'] < 16:
-                    # Bright green for leading edge
-                    self.led_matrix.set_pixel(drop['x'], drop['y'], (0, 255, 0))
-                else:
-                    self.drops.remove(drop)
+        moving = current_time - self.drop_time > 1.0 / self.drop_speed
+        self.drop_y[moving] += 1
+        self.drop_time[moving] = current_time
+        
+        # Bright green for leading edge
+        falling = self.drop_y < self.led_matrix.height
+        shown = moving & falling
+        buffer[self.drop_y[shown], self.drop_x[shown]] = (0, 255, 0)
+        
+        if not falling.all():
+            self.drop_x = self.drop_x[falling]
+            self.drop_y = self.drop_y[falling]
+            self.drop_speed = self.drop_speed[falling]
+            self.drop_time = self.drop_time[falling]
+
+
+def fire_color(heat_val):
+    """Fire gradient: black -> red -> orange -> yellow -> white"""
+    if heat_val < 0.3:
+        # Red
+        intensity = heat_val / 0.3
+        return (int(255 * intensity), 0, 0)
+    elif heat_val < 0.6:
+        # Orange
+        intensity = (heat_val - 0.3) / 0.3
+        return (255, int(128 * intensity), 0)
+    elif heat_val < 0.9:
+        # Yellow
+        intensity = (heat_val - 0.6) / 0.3
+        return (255, 128 + int(127 * intensity), 0)
+    else:
+        # White
+        intensity = (heat_val - 0.9) / 0.1
+        white_add = int(255 * intensity)
+        return (255, 255, white_add)
 
 
 class FireEffect(BasePattern):
+    PALETTE_SIZE = 1024  # Heat levels in the color lookup table
+    
     def __init__(self, led_matrix):
         super().__init__(led_matrix)
-        self.heat = np.zeros((16, 16))
+        height, width = led_matrix.height, led_matrix.width
+        self.heat = np.zeros((height, width))
+        
+        # Heat with a zero column either side, so edge cells sum only the
+        # neighbors they have, and the averaging factor (with cooling) of each cell
+        self.padded = np.zeros((height, width + 2))
+        self.row_sums = np.zeros((height, width))
+        neighbor_counts = np.full((height - 1, width), 6.0)
+        neighbor_counts[:, 0] = neighbor_counts[:, -1] = 4.0
+        if width == 1:
+            neighbor_counts[:] = 2.0
+        self.spread = 0.98 / neighbor_counts
+        
+        # Heat -> color palette, indexed by rounded heat * (PALETTE_SIZE - 1)
+        levels = np.linspace(0.0, 1.0, self.PALETTE_SIZE)
+        self.palette = np.array([fire_color(heat_val) for heat_val in levels], dtype=np.uint8)
         
     def update(self):
+        heat = self.heat
+        width = heat.shape[1]
+        
         # Cool down every cell a little
-        self.heat *= 0.95
+        heat *= 0.95
         
         # Add random heat at bottom
-        for x in range(16):
-            if random.random() < 0.8:
-                self.heat[15, x] = min(1.0, self.heat[15, x] + random.uniform(0.3, 1.0))
-        
-        # Heat rises and spreads
-        new_heat = self.heat.copy()
-        for y in range(14, -1, -1):
-            for x in range(16):
-                # Average with neighbors and cell below
-                neighbors = []
-                for dy in range(2):
-                    for dx in range(-1, 2):
-                        ny, nx = y + dy, x + dx
-                        if 0 <= ny < 16 and 0 <= nx < 16:
-                            neighbors.append(self.heat[ny, nx])
-                
-                new_heat[y, x] = np.mean(neighbors) * 0.98
-        
-        self.heat = new_heat
+        ignite = np.random.random(width) < 0.8
+        heat[-1] += np.where(ignite, np.random.uniform(0.3, 1.0, width), 0.0)
+        np.minimum(heat[-1], 1.0, out=heat[-1])
+        
+        # Heat rises and spreads: every row above the bottom becomes the
+        # average of its 3x2 neighborhood (itself, its sides and the row below)
+        self.padded[:, 1:-1] = heat
+        np.add(self.padded[:, :-2], self.padded[:, 1:-1], out=self.row_sums)
+        self.row_sums += self.padded[:, 2:]
+        np.add(self.row_sums[:-1], self.row_sums[1:], out=heat[:-1])
+        heat[:-1] *= self.spread
         
         # Convert heat to fire colors
-        for y in range(16):
-            for x in range(16):
-                heat_val = self.heat[y, x]
-                if heat_val > 0.1:
-                    # Fire gradient: black -> red -> orange -> yellow -> white
-                    if heat_val < 0.3:
-                        # Red
-                        intensity = heat_val / 0.3
-                        color = (int(255 * intensity), 0, 0)
-                    elif heat_val < 0.6:
-                        # Orange
-                        intensity = (heat_val - 0.3) / 0.3
-                        color = (255, int(128 * intensity), 0)
-                    elif heat_val < 0.9:
-                        # Yellow
-                        intensity = (heat_val - 0.6) / 0.3
-                        color = (255, 128 + int(127 * intensity), 0)
-                    else:
-                        # White
-                        intensity = (heat_val - 0.9) / 0.1
-                        white_add = int(255 * intensity)
-                        color = (255, 255, white_add)
-                    
-                    self.led_matrix.set_pixel(x, y, color)
+        hot = heat > 0.1
+        index = (heat[hot] * (self.PALETTE_SIZE - 1) + 0.5).astype(int)
+        self.led_matrix.buffer[hot] = self.palette[np.minimum(index, self.PALETTE_SIZE - 1)]
+        self.led_matrix.mark_dirty()
 
 
 class PlasmaEffect(BasePattern):
     def __init__(self, led_matrix):
         super().__init__(led_matrix)
         
+        # Coordinates scaled to the 16x16 layout so larger panels show
+        # the same picture at a finer grain
+        width, height = led_matrix.width, led_matrix.height
+        scale = 16.0 / max(width, height)
+        self.ys, self.xs = np.mgrid[0:height, 0:width] * scale
+        self.distance = np.sqrt((self.xs - width * scale / 2) ** 2 +
+                                (self.ys - height * scale / 2) ** 2)
+        
     def update(self):
         t = self.get_time()
         
-        for y in range(16):
-            for x in range(16):
-                # Create plasma effect using sine waves
-                v1 = math.sin((x + t) * 0.5)
-                v2 = math.sin((y + t) * 0.4)
-                v3 = math.sin((x + y + t) * 0.3)
-                v4 = math.sin(math.sqrt((x - 8)**2 + (y - 8)**2) + t)
-                
-                plasma = (v1 + v2 + v3 + v4) / 4.0
-                
-                # Convert to color
-                hue = (plasma + 1.0) / 2.0  # Normalize to 0-1
-                self.led_matrix.set_pixel_hsv(x, y, hue, 1.0, 1.0)
+        # Create plasma effect using sine waves over the whole frame
+        v1 = np.sin((self.xs + t) * 0.5)
+        v2 = np.sin((self.ys + t) * 0.4)
+        v3 = np.sin((self.xs + self.ys + t) * 0.3)
+        v4 = np.sin(self.distance + t)
+        
+        plasma = (v1 + v2 + v3 + v4) / 4.0
+        
+        # Convert to color
+        hue = (plasma + 1.0) / 2.0  # Normalize to 0-1
+        self.led_matrix.fill_hsv(hue, 1.0, 1.0)
 
 
 # Simple Games
 class Snake(BasePattern):
     def __init__(self, led_matrix):
         super().__init__(led_matrix)
-        self.snake = [(8, 8), (8, 9), (8, 10)]
+        self.width, self.height = led_matrix.width, led_matrix.height
+        
+        # Start in the middle moving up, food up and to the left
+        x, y = self.width // 2, self.height // 2
+        self.snake = [(x, y), (x, y + 1), (x, y + 2)]
         self.direction = (0, -1)  # Moving up
-        self.food = (4, 4)
+        self.food = (self.width // 4, self.height // 4)
         self.last_move = time.time()
         self.move_interval = 0.5
+        self.paused = False
+        
+    def toggle_settings(self):
+        """Pause or resume the game"""
+        self.paused = not self.paused
+        self.last_move = time.time()
+        
+    def next_change(self):
+        # The board only changes when the snake moves
+        if self.paused:
+            return self.UNTIL_INPUT
+        return self.last_move + self.move_interval
         
     def update(self):
         self.led_matrix.clear()
         
         # Move snake
         current_time = time.time()
-        if current_time - self.last_move > self.move_interval:
+        if not self.paused and current_time - self.last_move > self.move_interval:
             head = self.snake[0]
             new_head = (head[0] + self.direction[0], head[1] + self.direction[1])
             
             # Wrap around edges
-            new_head = (new_head[0] % 16, new_head[1] % 16)
+            new_head = (new_head[0] % self.width, new_head[1] % self.height)
             
             # Check if food eaten
             if new_head == self.food:
                 self.snake.insert(0, new_head)
-                self.food = (random.randint(0, 15), random.randint(0, 15))
+                self.food = (random.randint(0, self.width - 1), random.randint(0, self.height - 1))
                 self.move_interval *= 0.95  # Speed up slightly
             else:
                 self.snake.insert(0, new_head)
@@ -432,11 +590,12 @@ class Snake(BasePattern):
             
             self.last_move = current_time
         
-        # Draw snake
-        for i, (x, y) in enumerate(self.snake):
-            intensity = 1.0 - (i / len(self.snake)) * 0.7
-            color = (0, int(255 * intensity), 0)
-            self.led_matrix.set_pixel(x, y, color)
+        # Draw snake, fading towards the tail
+        xs, ys = np.array(self.snake).T
+        intensity = 1.0 - np.arange(len(self.snake)) / len(self.snake) * 0.7
+        buffer = self.led_matrix.buffer
+        buffer[ys, xs] = 0
+        buffer[ys, xs, 1] = (255 * intensity).astype(int)
         
         # Draw food
         self.led_matrix.set_pixel(self.food[0], self.food[1], (255, 0, 0))
@@ -445,63 +604,80 @@ class Snake(BasePattern):
 class ConwayLife(BasePattern):
     def __init__(self, led_matrix):
         super().__init__(led_matrix)
-        self.grid = np.random.choice([0, 1], size=(16, 16), p=[0.7, 0.3])
+        self.shape = (led_matrix.height, led_matrix.width)
+        self.grid = np.random.choice([0, 1], size=self.shape, p=[0.7, 0.3])
         self.last_update = time.time()
         self.update_interval = 0.2
+        self.settled = False  # Still life: the last generation changed nothing
+        
+        # Age-based coloring (simulate with random intensity), picked once
+        # per generation so redraws match
+        self.intensity = np.random.uniform(0.5, 1.0, size=self.shape)
+        
+    def next_change(self):
+        # The board only changes on generation steps, and not at all once settled
+        if self.settled:
+            return self.UNTIL_INPUT
+        return self.last_update + self.update_interval
         
     def update(self):
         current_time = time.time()
-        if current_time - self.last_update > self.update_interval:
-            self.grid = self.next_generation()
+        if not self.settled and current_time - self.last_update > self.update_interval:
+            new_grid = self.next_generation()
+            self.settled = np.array_equal(new_grid, self.grid)
+            self.grid = new_grid
+            self.intensity = np.random.uniform(0.5, 1.0, size=self.shape)
             self.last_update = current_time
             
             # Reset if all dead
             if np.sum(self.grid) == 0:
-                self.grid = np.random.choice([0, 1], size=(16, 16), p=[0.8, 0.2])
+                self.grid = np.random.choice([0, 1], size=self.shape, p=[0.8, 0.2])
+                self.settled = False
         
         # Draw grid
-        self.led_matrix.clear()
-        for y in range(16):
-            for x in range(16):
-                if self.grid[y, x]:
-                    # Age-based coloring (simulate with random intensity)
-                    intensity = random.uniform(0.5, 1.0)
-                    color = (int(255 * intensity), int(255 * intensity), 0)
-                    self.led_matrix.set_pixel(x, y, color)
+        level = np.where(self.grid, (255 * self.intensity).astype(int), 0)
+        buffer = self.led_matrix.buffer
+        buffer[..., 0] = level
+        buffer[..., 1] = level
+        buffer[..., 2] = 0
+        self.led_matrix.mark_dirty()
     
     def next_generation(self):
-        new_grid = np.zeros_like(self.grid)
-        
-        for y in range(16):
-            for x in range(16):
-                # Count neighbors (with wrapping)
-                neighbors = 0
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        ny, nx = (y + dy) % 16, (x + dx) % 16
-                        neighbors += self.grid[ny, nx]
-                
-                # Conway's rules
-                if self.grid[y, x] == 1:  # Alive
-                    if neighbors in [2, 3]:
-                        new_grid[y, x] = 1
-                else:  # Dead
-                    if neighbors == 3:
-                        new_grid[y, x] = 1
-        
-        return new_grid
+        # Count neighbors (with wrapping) by summing the eight shifted grids
+        neighbors = np.zeros_like(self.grid)
+        for dy in [-1, 0, 1]:
+            for dx in [-1, 0, 1]:
+                if dx == 0 and dy == 0:
+                    continue
+                neighbors += np.roll(self.grid, (dy, dx), axis=(0, 1))
+        
+        # Conway's rules: alive cells survive with 2 or 3 neighbors, dead
+        # cells come alive with exactly 3
+        alive = self.grid == 1
+        new_grid = (neighbors == 3) | (alive & (neighbors == 2))
+        return new_grid.astype(self.grid.dtype)
 
 
 class Tetris(BasePattern):
     def __init__(self, led_matrix):
         super().__init__(led_matrix)
-        self.grid = np.zeros((16, 16))
+        self.width, self.height = led_matrix.width, led_matrix.height
+        self.grid = np.zeros((self.height, self.width))
         self.current_piece = self.create_random_piece()
-        self.piece_x, self.piece_y = 8, 0
+        self.piece_x, self.piece_y = self.width // 2, 0
         self.last_drop = time.time()
         self.drop_interval = 1.0
+        self.paused = False
+        
+    def toggle_settings(self):
+        """Pause or resume the game"""
+        self.paused = not self.paused
+        self.last_drop = time.time()
+        
+    def next_change(self):
+        if self.paused:
+            return self.UNTIL_INPUT
+        return self.EVERY_FRAME
         
     def create_random_piece(self):
         pieces = [
@@ -514,6 +690,9 @@ class Tetris(BasePattern):
     
     def update(self):
         current_time = time.time()
+        if self.paused:
+            self.draw()
+            return
         
         # Drop piece
         if current_time - self.last_drop > self.drop_interval:
@@ -523,7 +702,7 @@ class Tetris(BasePattern):
                 self.place_piece()
                 self.clear_lines()
                 self.current_piece = self.create_random_piece()
-                self.piece_x, self.piece_y = 8, 0
+                self.piece_x, self.piece_y = self.width // 2, 0
             
             self.last_drop = current_time
         
@@ -533,46 +712,59 @@ class Tetris(BasePattern):
             if self.can_move(dx, 0):
                 self.piece_x += dx
         
-        # Draw everything
-        self.led_matrix.clear()
+        self.draw()
+    
+    def piece_cells(self, dx=0, dy=0):
+        """Board coordinates (xs, ys) of the current piece's cells, offset by (dx, dy)"""
+        ys, xs = np.nonzero(self.current_piece)
+        return xs + self.piece_x + dx, ys + self.piece_y + dy
+    
+    def draw(self):
+        """Draw the placed pieces and the falling piece"""
+        buffer = self.led_matrix.buffer
         
         # Draw placed pieces
-        for y in range(16):
-            for x in range(16):
-                if self.grid[y, x]:
-                    self.led_matrix.set_pixel(x, y, (100, 100, 100))
+        buffer[:] = 0
+        buffer[self.grid != 0] = (100, 100, 100)
         
         # Draw current piece
-        for py, row in enumerate(self.current_piece):
-            for px, cell in enumerate(row):
-                if cell:
-                    x, y = self.piece_x + px, self.piece_y + py
-                    if 0 <= x < 16 and 0 <= y < 16:
-                        self.led_matrix.set_pixel(x, y, (255, 255, 0))
+        xs, ys = self.piece_cells()
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        buffer[ys[inside], xs[inside]] = (255, 255, 0)
+        self.led_matrix.mark_dirty()
     
     def can_move(self, dx, dy):
-        for py, row in enumerate(self.current_piece):
-            for px, cell in enumerate(row):
-                if cell:
-                    x, y = self.piece_x + px + dx, self.piece_y + py + dy
-                    if x < 0 or x >= 16 or y >= 16 or (y >= 0 and self.grid[y, x]):
-                        return False
-        return True
+        xs, ys = self.piece_cells(dx, dy)
+        if np.any((xs < 0) | (xs >= self.width) | (ys >= self.height)):
+            return False
+        shown = ys >= 0
+        return not np.any(self.grid[ys[shown], xs[shown]])
     
     def place_piece(self):
-        for py, row in enumerate(self.current_piece):
-            for px, cell in enumerate(row):
-                if cell:
-                    x, y = self.piece_x + px, self.piece_y + py
-                    if 0 <= x < 16 and 0 <= y < 16:
-                        self.grid[y, x] = 1
+        xs, ys = self.piece_cells()
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        self.grid[ys[inside], xs[inside]] = 1
     
     def clear_lines(self):
-        lines_to_clear = []
-        for y in range(16):
-            if np.all(self.grid[y]):
-                lines_to_clear.append(y)
-        
-        for y in lines_to_clear:
-            self.grid = np.delete(self.grid, y, axis=0)
-            self.grid = np.vstack([np.zeros((1, 16)), self.grid])
\ No newline at end of file
+        # Drop the rows above each full row down into its place
+        full = self.grid.all(axis=1)
+        if full.any():
+            kept = self.grid[~full]
+            self.grid = np.zeros_like(self.grid)
+            self.grid[self.height - len(kept):] = kept
+
+
+# Pattern registry: names used in the Config pattern lists -> classes
+PATTERN_REGISTRY = {
+    'spectrum': SpectrumAnalyzer,
+    'waveform': WaveformPattern,
+    'circles': PulsingCircles,
+    'bars': FrequencyBars,
+    'clock': DigitalClock,
+    'matrix_rain': MatrixRain,
+    'fire': FireEffect,
+    'plasma': PlasmaEffect,
+    'snake': Snake,
+    'life': ConwayLife,
+    'tetris': Tetris
+}